@@ -1,7 +1,8 @@
 from __future__ import annotations
 import re
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 _DIGITS_RE = re.compile(r"\d+")
 def canonical_num(num: str) -> str:
@@ -14,13 +15,216 @@ def has_leading_letter(num: str) -> bool:
     s = (num or "").strip()
     return bool(re.match(r"^[A-Za-z]\d{8,}$", s))
 
-def aggregate_by_comparendo(df: pd.DataFrame, platform_order: List[str]) -> pd.DataFrame:
+AGG_COLS = ["numero_comparendo","fecha_imposicion","fecha_notificacion","placa","plataformas","numero_veces"]
+_LEADING_LETTER_PAT = r"[A-Za-z]\d{8,}"
+
+
+# -------------------- Máscara de plataformas --------------------
+MASK_COL = "plataformas_mask"
+MASK_COLS = ["numero_comparendo","fecha_imposicion","fecha_notificacion","placa",MASK_COL,"numero_veces"]
+MASK_MAX_BITS = 62  # hasta aquí la máscara cabe en int64; con más plataformas se usan enteros de Python
+
+
+class PlatformBits:
+    """
+    Un bit por plataforma: las de 'platform_order' en ese orden y las desconocidas a continuación,
+    según se van registrando. Pertenencia = AND, unión = OR, numero_veces = popcount; el texto
+    "SIMIT-FENIX-..." se arma una vez por máscara distinta y solo al mostrar/exportar.
+    """
+
+    def __init__(self, platform_order: List[str] = ()):
+        self.labels: List[str] = []
+        self._bit: Dict[str, int] = {}
+        self._text: Dict[tuple, str] = {}
+        for p in platform_order:
+            self.add(p)
+
+    def add(self, label: str) -> int:
+        bit = self._bit.get(label)
+        if bit is None:
+            bit = self._bit[label] = 1 << len(self.labels)
+            self.labels.append(label)
+        return bit
+
+    def bit(self, label: str) -> int:
+        """Bit de 'label' (0 si no está registrada)."""
+        return self._bit.get(label, 0)
+
+    @property
+    def dtype(self) -> Any:
+        return "int64" if len(self.labels) <= MASK_MAX_BITS else object
+
+    def encode(self, labels: pd.Series) -> pd.Series:
+        """Bit de cada etiqueta ('' -> 0); las desconocidas se registran por orden de aparición."""
+        for lab in labels.unique().tolist():
+            if lab:
+                self.add(lab)
+        bit_of = {**self._bit, "": 0}
+        if self.dtype == "int64":
+            return labels.map(bit_of).astype("int64")
+        return labels.map(lambda s: bit_of[s]).astype(object)
+
+    def encode_joined(self, texts: pd.Series, sep: str = "-") -> pd.Series:
+        """Máscara de textos 'P1-P2-...' ya armados (se dividen una vez por texto distinto)."""
+        masks: Dict[Any, int] = {}
+        for t in texts.unique().tolist():
+            m = 0
+            for p in (t.split(sep) if isinstance(t, str) else []):
+                p = p.strip()
+                if p:
+                    m |= self.add(p)
+            masks[t] = m
+        if not masks:
+            return pd.Series(0, index=texts.index, dtype=self.dtype)
+        return texts.map(masks).astype(self.dtype)
+
+    def fold_case(self, mask: int) -> int:
+        """La misma máscara con cada plataforma en el bit de la primera registrada con igual nombre sin mayúsculas."""
+        first: Dict[str, int] = {}
+        out = 0
+        for i, p in enumerate(self.labels):
+            bit = first.setdefault(p.lower(), 1 << i)
+            if (mask >> i) & 1:
+                out |= bit
+        return out
+
+    def union_by(self, keys: pd.Series, bits: pd.Series) -> pd.Series:
+        """Máscara por clave (OR de sus bits), en orden de aparición de la clave."""
+        pairs = pd.DataFrame({"key": keys, "bit": bits}).drop_duplicates()
+        g = pairs.groupby("key", sort=False)["bit"]
+        if self.dtype == "int64":
+            return g.sum().astype("int64")  # bits únicos por clave: la suma es el OR
+        return g.agg(lambda s: sum(s.tolist()))
+
+    def popcount(self, masks: pd.Series) -> pd.Series:
+        counts = {m: bin(int(m)).count("1") for m in masks.unique().tolist()}
+        return masks.map(counts).astype(int)
+
+    def labels_of(self, mask: int) -> List[str]:
+        return [p for i, p in enumerate(self.labels) if (mask >> i) & 1]
+
+    def text(self, mask: int, alphabetical: bool = False) -> str:
+        """'P1-P2-...' en orden de bits (platform_order) o alfabético (sin distinguir mayúsculas)."""
+        key = (mask, alphabetical)
+        txt = self._text.get(key)
+        if txt is None:
+            plats = self.labels_of(mask)
+            if alphabetical:
+                plats = sorted(plats, key=str.lower)
+            txt = self._text[key] = "-".join(plats)
+        return txt
+
+    def render(self, masks: pd.Series, alphabetical: bool = False) -> pd.Series:
+        texts = {m: self.text(int(m), alphabetical) for m in masks.unique().tolist()}
+        return masks.map(texts).astype(object)
+
+
+def render_platforms(df: pd.DataFrame, bits: PlatformBits) -> pd.DataFrame:
+    """Conteo para mostrar/exportar: la columna de máscara pasa a ser el texto 'plataformas' (AGG_COLS)."""
+    if MASK_COL not in df.columns:
+        return df
+    out = df.copy()
+    out[MASK_COL] = bits.render(df[MASK_COL]) if not df.empty else pd.Series(dtype=object)
+    return out.rename(columns={MASK_COL: "plataformas"})
+
+
+# -------------------- Conteo --------------------
+def aggregate_by_comparendo(df: pd.DataFrame, platform_order: List[str], engine: str = "vectorized") -> pd.DataFrame:
     """
     Agrega por número canónico (ignora una letra inicial SOLO para equivalencia).
     - numero_comparendo mostrado: si existe versión con letra, se prioriza esa.
     - plataformas: unión única de plataformas (ordenada por platform_order), separadas por '-'.
     - numero_veces: cantidad de plataformas únicas.
     - fecha_imposicion / fecha_notificacion / placa: primeras no vacías encontradas.
+
+    engine="vectorized" (por defecto) usa groupby columnar (lineal en filas);
+    engine="rowwise" usa la implementación de referencia fila a fila.
+    """
+    if engine == "rowwise":
+        return aggregate_by_comparendo_rowwise(df, platform_order)
+    if engine != "vectorized":
+        raise ValueError(f"Motor de agregación desconocido: {engine}")
+    return _aggregate_vectorized(df, platform_order)
+
+
+def _str_col(df: pd.DataFrame, col: str) -> pd.Series:
+    """Columna como str sin espacios (equivale a str(row.get(col, '')).strip())."""
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[col].map(str).str.strip()
+
+
+def _work_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Filas con número no vacío como str limpios: key, numero_comparendo, fechas, placa, plataforma."""
+    nums = _str_col(df, "numero_comparendo")
+    keep = nums != ""
+    nums = nums[keep]
+    work = pd.DataFrame({
+        "key": nums.str.replace(r"\D+", "", regex=True),
+        "numero_comparendo": nums,
+        "fecha_imposicion": _str_col(df, "fecha_imposicion")[keep],
+        "fecha_notificacion": _str_col(df, "fecha_notificacion")[keep],
+        "placa": _str_col(df, "placa")[keep],
+    })
+    plat = _str_col(df, "plataforma")[keep]
+    if "plataformas" in df.columns:
+        plat = plat.where(plat != "", _str_col(df, "plataformas")[keep])
+    work["plataforma"] = plat
+    return work.reset_index(drop=True)
+
+
+def aggregate_masks(df: pd.DataFrame, bits: PlatformBits) -> pd.DataFrame:
+    """
+    Conteo con las plataformas como máscara (MASK_COLS): lo que se usa internamente.
+    El texto 'plataformas' se arma con render_platforms() solo al mostrar/exportar.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=MASK_COLS)
+    return _aggregate_work(_work_frame(df), bits)[MASK_COLS]
+
+
+def _aggregate_work(work: pd.DataFrame, bits: PlatformBits) -> pd.DataFrame:
+    """aggregate_masks sobre filas ya preparadas con _work_frame; conserva la clave ('key' + MASK_COLS)."""
+    if work.empty:
+        return pd.DataFrame(columns=["key"] + MASK_COLS)
+
+    # groupby(sort=False) conserva el orden de aparición de cada clave (como el dict original)
+    g = work.groupby("key", sort=False)
+
+    # numero_comparendo: primera versión con letra; si no hay, la primera encontrada
+    lettered = work["numero_comparendo"].str.fullmatch(_LEADING_LETTER_PAT)
+    first_num = g["numero_comparendo"].first()
+    first_lettered = work.loc[lettered, ["key", "numero_comparendo"]].drop_duplicates("key").set_index("key")["numero_comparendo"]
+    out = pd.DataFrame({"numero_comparendo": first_num})
+    out.loc[first_lettered.index, "numero_comparendo"] = first_lettered
+
+    # Fechas / placa: primeras no vacías (first() ignora NaN)
+    for c in ("fecha_imposicion", "fecha_notificacion", "placa"):
+        out[c] = work[c].where(work[c] != "").groupby(work["key"], sort=False).first().reindex(out.index).fillna("")
+
+    # Plataformas: un bit por plataforma; la unión por clave es un OR y numero_veces su popcount
+    plats = work.loc[work["plataforma"] != "", ["key", "plataforma"]]
+    masks = bits.union_by(plats["key"], bits.encode(plats["plataforma"]))
+    out[MASK_COL] = masks.reindex(out.index).fillna(0).astype(bits.dtype)
+    out["numero_veces"] = bits.popcount(out[MASK_COL])
+
+    # numero_comparendo es único por clave: ordenar por él basta (el orden de siempre)
+    out = out.rename_axis("key").reset_index()[["key"] + MASK_COLS]
+    return out.sort_values("numero_comparendo", kind="stable").reset_index(drop=True)
+
+
+def _aggregate_vectorized(df: pd.DataFrame, platform_order: List[str]) -> pd.DataFrame:
+    bits = PlatformBits(platform_order)
+    return render_platforms(aggregate_masks(df, bits), bits)
+
+
+def aggregate_by_comparendo_rowwise(df: pd.DataFrame, platform_order: List[str]) -> pd.DataFrame:
+    """
+    Implementación de referencia (fila a fila) de aggregate_by_comparendo.
+    - numero_comparendo mostrado: si existe versión con letra, se prioriza esa.
+    - plataformas: unión única de plataformas (ordenada por platform_order), separadas por '-'.
+    - numero_veces: cantidad de plataformas únicas.
+    - fecha_imposicion / fecha_notificacion / placa: primeras no vacías encontradas.
     """
     if df.empty:
         return pd.DataFrame(columns=[
@@ -80,9 +284,194 @@ def aggregate_by_comparendo(df: pd.DataFrame, platform_order: List[str]) -> pd.D
             "numero_veces": len(uniq_plats),
         })
 
-    out = pd.DataFrame(rows, columns=[
-        "numero_comparendo","fecha_imposicion","fecha_notificacion","placa","plataformas","numero_veces"
-    ])
+    out = pd.DataFrame(rows, columns=AGG_COLS)
     if not out.empty:
         out = out.sort_values(["numero_comparendo","plataformas"], kind="stable").reset_index(drop=True)
     return out
+
+
+# -------------------- Conteo incremental por plataforma --------------------
+class IncrementalAggregate:
+    """
+    Conteo (mismo resultado que aggregate_masks sobre las filas de todas las fuentes concatenadas
+    en orden) que se actualiza por fuente: replace_source(p, filas) solo recalcula las claves de
+    esa fuente (las que tenía y las que trae ahora).
+
+    Cada clave tiene un código entero estable; por fuente se guardan sus filas ya preparadas
+    (_work_frame), el código de cada fila y un índice código -> posiciones de fila (códigos ordenados
+    + permutación), así que juntar las filas de las claves afectadas cuesta lo que esas filas
+    (dos searchsorted por fuente), sin recorrer las demás. El primer Conteo, o uno donde cambia buena
+    parte de las claves, es un aggregate_masks de todo; después, las filas afectadas se agregan aparte
+    y se insertan en el Conteo ya ordenado (searchsorted). Lo único que sigue siendo O(filas del Conteo)
+    es armar el Conteo nuevo: una copia de arreglos numpy por columna, sin hashing de claves; a 300k
+    registros son unas decenas de milisegundos. El resto cuesta lo que las filas de las claves afectadas.
+    Las plataformas desconocidas toman bit (y lugar en el texto) en el orden en que se ven por primera vez
+    en las filas concatenadas; si un cambio altera ese orden, se recalcula todo con bits nuevos.
+    """
+
+    REBUILD_RATIO = 0.5  # si cambia más de esta fracción de las claves, se recalcula todo
+
+    def __init__(self, platform_order: List[str]):
+        self.platform_order = list(platform_order)
+        self.bits = PlatformBits(self.platform_order)
+        self._code_of: Dict[str, int] = {}  # clave -> código entero (no se reutilizan)
+        self._key_of: List[str] = []         # código -> clave
+        self._work: Dict[str, pd.DataFrame] = {}  # fuente -> filas preparadas (_work_frame)
+        self._codes: Dict[str, np.ndarray] = {}   # fuente -> código de cada fila de _work
+        self._index: Dict[str, Any] = {}          # fuente -> (permutación, códigos ordenados)
+        self._labels: Dict[str, List[str]] = {}   # fuente -> sus plataformas en orden de aparición
+        self._frame: pd.DataFrame = pd.DataFrame(columns=MASK_COLS)
+        self._frame_codes: np.ndarray = np.empty(0, dtype=np.int64)  # código de cada fila de _frame
+        # Claves recalculadas en el último replace_sources; None si cambió todo (arranque o bits nuevos)
+        self.last_changed: Optional[pd.Index] = None
+
+    def _encode_keys(self, keys: pd.Series) -> np.ndarray:
+        code_of, key_of = self._code_of, self._key_of
+        out = np.empty(len(keys), dtype=np.int64)
+        for i, k in enumerate(keys.tolist()):
+            c = code_of.get(k)
+            if c is None:
+                c = code_of[k] = len(key_of)
+                key_of.append(k)
+            out[i] = c
+        return out
+
+    def _source_order(self) -> List[str]:
+        known = [p for p in self.platform_order if p in self._work]
+        return known + [p for p in self._work if p not in self.platform_order]
+
+    def _rows_of_codes(self, source: str, codes: np.ndarray) -> np.ndarray:
+        """Posiciones (en orden original) de las filas de 'source' cuyas claves están en 'codes' (ordenados)."""
+        perm, sorted_codes = self._index[source]
+        lo = np.searchsorted(sorted_codes, codes, side="left")
+        hi = np.searchsorted(sorted_codes, codes, side="right")
+        n = hi - lo
+        hit = n > 0
+        lo, n = lo[hit], n[hit]
+        if not len(n):
+            return np.empty(0, dtype=np.int64)
+        # Rangos [lo, hi) concatenados sin bucle de Python
+        starts = np.repeat(lo - np.concatenate(([0], np.cumsum(n)[:-1])), n)
+        return np.sort(perm[starts + np.arange(n.sum())])
+
+    def _all_work(self, codes: Optional[np.ndarray] = None) -> pd.DataFrame:
+        frames = []
+        for s in self._source_order():
+            w = self._work[s]
+            if codes is not None:
+                w = w.iloc[self._rows_of_codes(s, codes)]
+            if not w.empty:
+                frames.append(w)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["key"])
+
+    def _unknown_labels(self) -> List[str]:
+        """Plataformas fuera de 'platform_order' en el orden en que las vería aggregate_masks."""
+        known = set(self.platform_order)
+        seen: Dict[str, None] = {}
+        for s in self._source_order():
+            for lab in self._labels[s]:
+                if lab not in known:
+                    seen.setdefault(lab, None)
+        return list(seen)
+
+    def _set_frame(self, agg: pd.DataFrame) -> None:
+        self._frame_codes = np.fromiter((self._code_of[k] for k in agg["key"].tolist()),
+                                        dtype=np.int64, count=len(agg))
+        self._frame = agg[MASK_COLS].reset_index(drop=True)
+
+    def _rebuild(self, fresh_bits: bool = False) -> None:
+        if fresh_bits:
+            self.bits = PlatformBits(self.platform_order)
+        self._set_frame(_aggregate_work(self._all_work(), self.bits))
+
+    def replace_sources(self, rows_by_source: Dict[str, Any]) -> int:
+        """Reemplaza varias fuentes de una vez. Devuelve cuántas claves se recalcularon."""
+        affected: List[np.ndarray] = []
+        for source, rows in rows_by_source.items():
+            self._work.pop(source, None)
+            self._index.pop(source, None)
+            self._labels.pop(source, None)
+            old = self._codes.pop(source, None)
+            if old is not None:
+                affected.append(old)
+            df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows or []))
+            work = _work_frame(df) if not df.empty else pd.DataFrame()
+            if not work.empty:
+                codes = self._encode_keys(work["key"])
+                perm = np.argsort(codes, kind="stable")
+                self._work[source] = work
+                self._codes[source] = codes
+                self._index[source] = (perm, codes[perm])
+                self._labels[source] = [p for p in work["plataforma"].unique().tolist() if p]
+                affected.append(codes)
+        self.last_changed = pd.Index([], dtype=object)
+        if not affected:
+            return 0
+        if not len(self._frame_codes):
+            # Arranque en frío: un solo aggregate_masks de todas las fuentes
+            self._rebuild(fresh_bits=True)
+            self.last_changed = None
+            return len(self._frame_codes)
+        codes = np.unique(np.concatenate(affected))
+        if not len(codes):
+            return 0
+        self.last_changed = pd.Index([self._key_of[c] for c in codes.tolist()], dtype=object)
+
+        unknown = self._unknown_labels()
+        registered = self.bits.labels[len(self.platform_order):]
+        if unknown[:len(registered)] != registered:
+            # Cambió el orden de las plataformas desconocidas (o sobran): bits nuevos y todo de nuevo
+            self._rebuild(fresh_bits=True)
+            self.last_changed = None  # el texto de plataformas puede cambiar en cualquier clave
+            return len(codes)
+        for lab in unknown[len(registered):]:
+            self.bits.add(lab)  # las nuevas, en el orden que tendrían en el Conteo completo
+        if len(codes) > self.REBUILD_RATIO * len(self._frame_codes):
+            self._rebuild()
+            return len(codes)
+
+        self._patch(codes, _aggregate_work(self._all_work(codes), self.bits))
+        return len(codes)
+
+    def _patch(self, codes: np.ndarray, patch: pd.DataFrame) -> None:
+        """Quita del Conteo las filas de 'codes' e inserta 'patch' (ordenado) en su lugar, columna a columna."""
+        flag = np.zeros(len(self._key_of), dtype=bool)
+        flag[codes] = True
+        kept = np.flatnonzero(~flag[self._frame_codes])
+        old = self._frame
+        nums = old["numero_comparendo"].to_numpy(dtype=object)[kept]
+        # 'kept' y 'patch' ya vienen ordenados por numero_comparendo
+        at = np.searchsorted(nums, patch["numero_comparendo"].to_numpy(dtype=object), side="right")
+        new_pos = at + np.arange(len(patch))
+        is_new = np.zeros(len(kept) + len(patch), dtype=bool)
+        is_new[new_pos] = True
+        mask_dtype = np.dtype(self.bits.dtype)
+        cols: Dict[str, np.ndarray] = {}
+        for c in MASK_COLS:
+            dtype = mask_dtype if c == MASK_COL else (np.dtype("int64") if c == "numero_veces" else object)
+            arr = np.empty(len(is_new), dtype=dtype)
+            arr[~is_new] = old[c].to_numpy()[kept]
+            arr[new_pos] = patch[c].to_numpy()
+            cols[c] = arr
+        self._frame = pd.DataFrame(cols, columns=MASK_COLS)
+        frame_codes = np.empty(len(is_new), dtype=np.int64)
+        frame_codes[~is_new] = self._frame_codes[kept]
+        frame_codes[new_pos] = [self._code_of[k] for k in patch["key"].tolist()]
+        self._frame_codes = frame_codes
+
+    def replace_source(self, source: str, rows: Any) -> int:
+        """Reemplaza las filas de 'source' (lista de dicts o DataFrame); solo se recalculan sus claves."""
+        return self.replace_sources({source: rows})
+
+    def sources(self) -> List[str]:
+        return self._source_order()
+
+    def rows_of(self, keys: pd.Index) -> pd.DataFrame:
+        """Filas del Conteo (MASK_COLS) de las claves dadas, en el orden del Conteo."""
+        flag = np.zeros(len(self._key_of), dtype=bool)
+        flag[[self._code_of[k] for k in keys if k in self._code_of]] = True
+        return self._frame[flag[self._frame_codes]]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Conteo completo con máscara (MASK_COLS, ordenado como aggregate_by_comparendo); texto con render_platforms."""
+        return self._frame
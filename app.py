@@ -1,38 +1,41 @@
 from __future__ import annotations
+import hashlib
+import io
+import os
 import streamlit as st
 import pandas as pd
-from typing import Dict, List, Any
-from datetime import datetime
+from typing import Dict
+from datetime import date, datetime
 
-from parsers import parse_platform, PARSERS, parse_simit_coactivos
-from aggregator import aggregate_by_comparendo
-from comparator import build_three_tables
 from export_utils import dfs_to_excel_bytes
-from backfill import read_yesterday_summary, build_backfill_rows
-from modificados import build_modificados_table
+from backfill import read_yesterday_summary
+from yesterday_index import YesterdayIndex
+from pipeline import (
+    PLATFORMS, COACTIVOS_COLS, new_state, content_digest, run_pipeline, report_sheets,
+    use_snapshot_as_yesterday, snapshot_notice, save_snapshot, missing_platforms, conteo_frame, raw_frame,
+)
+from snapshot_store import SnapshotStore, DEFAULT_DB_PATH, DEFAULT_KEEP_DAYS
+from history import History, TOTAL
+from parsers import PARSE_MODES
+from profiling import StageProfiler
+from deadlines import DeadlineQueue
 from frontend import (
     load_custom_css, get_icon, render_main_header, render_section_header,
     render_alert, render_metric_cards, render_processing_summary, render_footer
 )
 
 APP_KEY = "comparendos_app_state"
-PLATFORMS = list(PARSERS.keys())
+UPLOAD_CACHE_MAX_ENTRIES = 8  # archivos parseados que se conservan en memoria (LRU, compartido entre sesiones)
+REPORT_CACHE_MAX_ENTRIES = 4  # reportes .xlsx ya serializados (por huella de sus hojas)
+# Modo de parseo de plataformas: auto | serial | thread | process (ver parsers.parse_many).
+# Se valida al cargar: un valor mal escrito cae en "auto" con un aviso, no en un error al Procesar.
+PARSE_MODE_ENV = os.environ.get("COMPARENDOS_PARSE_MODE", "auto").strip().lower()
+PARSE_MODE = PARSE_MODE_ENV if PARSE_MODE_ENV in PARSE_MODES else "auto"
 
 # -------------------- Estado --------------------
 def init_state():
-    expected = {
-        "inputs": {p: "" for p in PLATFORMS},
-        "rows_by_platform": {p: [] for p in PLATFORMS},
-        "platform_down": {p: False for p in PLATFORMS},
-        "yesterday_summary_df": None,
-        "yesterday_any_df": None,
-        "df_raw": pd.DataFrame(),
-        "df_today": pd.DataFrame(),
-        "three_tables": None,
-        "df_modificados": pd.DataFrame(),
-        "view_mode": "resumen",  # opciones: "resumen", "nuevos", "mantenidos", "eliminados", "modificados",
-        "coactivos_simit": [],  # estado para cobros coactivos
-    }
+    expected = new_state()
+    expected["view_mode"] = "resumen"  # opciones: "resumen", "nuevos", "mantenidos", "eliminados", "modificados",
     if APP_KEY not in st.session_state or not isinstance(st.session_state[APP_KEY], dict):
         st.session_state[APP_KEY] = expected
         return
@@ -50,22 +53,6 @@ def init_state():
             if old not in PLATFORMS:
                 del app[sub][old]
 
-def replace_platform_rows(platform: str, rows: List[Dict[str, Any]]) -> None:
-    st.session_state[APP_KEY]["rows_by_platform"][platform] = rows
-
-def concat_all_rows() -> pd.DataFrame:
-    data: List[Dict[str, Any]] = []
-    for p in PLATFORMS:
-        data.extend(st.session_state[APP_KEY]["rows_by_platform"][p])
-    cols = ["numero_comparendo", "fecha_imposicion", "fecha_notificacion", "placa", "plataforma"]
-    if not data:
-        return pd.DataFrame(columns=cols)
-    df = pd.DataFrame(data)
-    for c in cols:
-        if c not in df.columns:
-            df[c] = ""
-    return df[cols]
-
 def clear_platform(platform: str) -> None:
     st.session_state[APP_KEY]["inputs"][platform] = ""
     st.session_state[APP_KEY]["rows_by_platform"][platform] = []
@@ -80,87 +67,154 @@ def clear_all() -> None:
     st.session_state[APP_KEY]["rows_by_platform"] = {p: [] for p in PLATFORMS}
     st.session_state[APP_KEY]["platform_down"] = {p: False for p in PLATFORMS}
     st.session_state[APP_KEY]["yesterday_summary_df"] = None
+    st.session_state[APP_KEY]["yesterday_summary_digest"] = ""
     st.session_state[APP_KEY]["yesterday_any_df"] = None
+    st.session_state[APP_KEY]["yesterday_index"] = None
+    st.session_state[APP_KEY]["yesterday_any_digest"] = ""
+    st.session_state[APP_KEY]["yesterday_source"] = ""
+    st.session_state[APP_KEY]["yesterday_summary_source"] = ""
     st.session_state[APP_KEY]["df_raw"] = pd.DataFrame()
     st.session_state[APP_KEY]["df_today"] = pd.DataFrame()
     st.session_state[APP_KEY]["three_tables"] = None
     st.session_state[APP_KEY]["df_modificados"] = pd.DataFrame()
     st.session_state[APP_KEY]["view_mode"] = "resumen"
     st.session_state[APP_KEY]["coactivos_simit"] = []
+    st.session_state[APP_KEY]["parse_cache"] = {}
+    st.session_state[APP_KEY]["stage_fingerprints"] = {}
+    st.session_state[APP_KEY]["snapshot_fingerprint"] = ""
+    st.session_state[APP_KEY]["aggregate_inc"] = None
+    st.session_state[APP_KEY]["aggregate_inputs"] = {}
+    st.session_state[APP_KEY]["raw_frames"] = {}
+    st.session_state[APP_KEY]["stage_seconds"] = {}
+    st.session_state[APP_KEY]["profile"] = None
+    st.session_state[APP_KEY]["deadlines"] = DeadlineQueue()
     # Limpiar widgets de texto
     for p in PLATFORMS:
         wkey = f"input_{p}"
         if wkey in st.session_state:
             st.session_state[wkey] = ""
 
+# -------------------- Caché de archivos cargados --------------------
+# Clave = hash del contenido; '_data' no se hashea (prefijo '_'), así cada rerun solo calcula un sha256.
+# cache_resource es compartido entre sesiones y devuelve el mismo objeto: los DataFrames son de solo lectura.
+@st.cache_resource(max_entries=UPLOAD_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_summary_upload(digest: str, _data: bytes) -> pd.DataFrame:
+    return read_yesterday_summary(io.BytesIO(_data))
+
+@st.cache_resource(max_entries=UPLOAD_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_comparison_upload(digest: str, _data: bytes) -> YesterdayIndex:
+    # Lectura en streaming del .xlsx directo al índice (encabezado y columnas detectados en las primeras filas)
+    return YesterdayIndex.from_workbook(io.BytesIO(_data), detect=True)
+
+@st.cache_resource(show_spinner=False)
+def _get_store(path: str) -> SnapshotStore:
+    return SnapshotStore(path)
+
+# -------------------- Reporte Excel (perezoso + caché) --------------------
+def _sheets_fingerprint(sheets: Dict[str, pd.DataFrame]) -> str:
+    """Huella del contenido de las hojas (nombres, columnas y valores); no depende de la hora."""
+    h = hashlib.sha256()
+    for name, df in sheets.items():
+        h.update(str(name).encode("utf-8"))
+        h.update(repr(list(df.columns)).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+# Solo se serializa cuando cambian los datos; los reruns por widgets reutilizan los bytes.
+@st.cache_data(max_entries=REPORT_CACHE_MAX_ENTRIES, show_spinner=False)
+def _build_report_bytes(fingerprint: str, _sheets: Dict[str, pd.DataFrame]) -> bytes:
+    return dfs_to_excel_bytes(_sheets)
+
 # -------------------- Proceso unificado --------------------
 def run_all() -> None:
-    # 1) Parseo HOY (texto pegado)
-    for name in PLATFORMS:
-        text = st.session_state[APP_KEY]["inputs"][name]
-        rows = parse_platform(name, text)
-        st.session_state[APP_KEY]["rows_by_platform"][name] = rows
-        if name == "SIMIT":
-            coactivos = parse_simit_coactivos(text)
-            st.session_state[APP_KEY]["coactivos_simit"] = coactivos
-
-    # 2) Backfill si marcaste caídas y cargaste Resumen AYER (hoja 1)
-    df_prev = st.session_state[APP_KEY]["yesterday_summary_df"]
-    replaced = []
-    if df_prev is not None and not getattr(df_prev, "empty", False):
-        for p, is_down in st.session_state[APP_KEY]["platform_down"].items():
-            if is_down:
-                backfill_rows = build_backfill_rows(df_prev, p)
-                if backfill_rows:
-                    st.session_state[APP_KEY]["rows_by_platform"][p] = backfill_rows
-                    replaced.append(p)
-    if replaced:
-        st.success("Backfill: " + ", ".join(replaced))
-    elif any(st.session_state[APP_KEY]["platform_down"].values()) and (df_prev is None or getattr(df_prev, "empty", False)):
-        st.warning("Marcaste caídas, pero no subiste el Resumen de AYER.")
-
-    # 3) Crudo + Conteo
-    df_raw = concat_all_rows()
-    df_today = aggregate_by_comparendo(df_raw, platform_order=PLATFORMS)
-
-    st.session_state[APP_KEY]["df_raw"] = df_raw
-    st.session_state[APP_KEY]["df_today"] = df_today
-
-    # 4) Tres tablas (comparativa) si hay Excel AYER cargado
-    df_y_any = st.session_state[APP_KEY]["yesterday_any_df"]
-    df_prev_summary = st.session_state[APP_KEY]["yesterday_summary_df"]
-    counts = {"nuevos": 0, "mantenidos": 0, "eliminados": 0}
-    if df_y_any is not None and not getattr(df_y_any, "empty", False) and not df_today.empty:
+    # Sin "Medir tiempos" el perfilador solo toma el tiempo de pared por etapa
+    profiler = StageProfiler(
+        enabled=bool(st.session_state.get("profile_enabled", False)),
+        trace_memory=bool(st.session_state.get("profile_memory", False)),
+        use_cprofile=bool(st.session_state.get("profile_cprofile", False)),
+    )
+    app = st.session_state[APP_KEY]
+    app["modificados_all"] = bool(st.session_state.get("modificados_all", False))
+    for level, msg in run_pipeline(app, parse_mode=PARSE_MODE, profiler=profiler):
+        getattr(st, level)(msg)
+
+def save_day_ui() -> None:
+    """Botón explícito: el día queda como AYER para mañana solo si la corrida está completa."""
+    app = st.session_state[APP_KEY]
+    missing = missing_platforms(app)
+    help_txt = (f"Faltan: {', '.join(missing)} (pega su texto o márcala como caída)." if missing
+                else f"Guarda el día en {DEFAULT_DB_PATH}; se conservan los últimos {DEFAULT_KEEP_DAYS} días.")
+    if st.button("💾 Guardar día en el histórico", disabled=bool(missing) or app["df_today"].empty,
+                 use_container_width=True, help=help_txt):
         try:
-            res = build_three_tables(df_today, df_y_any, df_prev_summary=df_prev_summary, )
+            with st.spinner("Guardando en el histórico..."):
+                saved = save_snapshot(app, _get_store(DEFAULT_DB_PATH), date.today().isoformat())
+            st.success("Día guardado en el histórico." if saved else "El histórico ya tenía este día.")
         except Exception as e:
-            st.session_state[APP_KEY]["three_tables"] = None
-            st.session_state[APP_KEY]["counts"] = counts
-            st.error(f"No fue posible generar comparativa: {e}")
-        else:
-            st.session_state[APP_KEY]["three_tables"] = res
-            counts = {
-                "nuevos": len(res["NUEVOS"]),
-                "mantenidos": len(res["MANTENIDOS"]),
-                "eliminados": len(res["ELIMINADOS"]),
-            }
-            st.session_state[APP_KEY]["counts"] = counts
-    else:
-        st.session_state[APP_KEY]["three_tables"] = None
-        st.session_state[APP_KEY]["counts"] = counts
+            st.warning(f"No fue posible guardar el día en el histórico: {e}")
 
-    # 5) Modificados (SIMIT vs Excel AYER)
-    rows_simit = st.session_state[APP_KEY]["rows_by_platform"].get("SIMIT", [])
-    if df_y_any is not None and not getattr(df_y_any, "empty", False) and rows_simit:
+def timing_panel_ui() -> None:
+    prof = st.session_state[APP_KEY].get("profile")
+    if prof is None or not prof.records:
+        return
+    with st.expander("⏱️ Tiempos por etapa (última corrida)", expanded=False):
+        st.dataframe(prof.to_frame(), use_container_width=True)
+        c1, c2 = st.columns(2)
+        with c1:
+            st.download_button("Descargar tiempos (JSON)", data=prof.to_json().encode("utf-8"),
+                               file_name="tiempos_etapas.json", mime="application/json",
+                               use_container_width=True)
+        dump = prof.cprofile_dump()
+        if dump:
+            with c2:
+                st.download_button("Descargar cProfile (.prof)", data=dump, file_name="perfil_comparendos.prof",
+                                   mime="application/octet-stream", use_container_width=True)
+            st.code(prof.cprofile_text(), language="text")
+
+def history_panel_ui() -> None:
+    if not st.session_state.get("snapshot_enabled", True):
+        return
+    try:
+        store = _get_store(DEFAULT_DB_PATH)
+        days = store.days()
+    except Exception:
+        return
+    if len(days) < 2:
+        return
+    with st.expander("📅 Histórico: comparar días y tendencias", expanded=False):
+        hist = History(store)
+        c1, c2 = st.columns(2)
+        with c1:
+            d1 = st.selectbox("Día base", days, index=len(days) - 2, key="hist_d1")
+        with c2:
+            d2 = st.selectbox("Comparar con", days, index=len(days) - 1, key="hist_d2")
+        if d1 != d2:
+            trans = hist.transition(d1, d2)
+            st.dataframe(pd.DataFrame.from_dict(trans, orient="index"), use_container_width=True)
+            if st.button("Ver tablas de ese par de días", key="hist_tables"):
+                for name, df in hist.compare_days(d1, d2).items():
+                    st.markdown(f"**{name.title()}** ({len(df)})")
+                    st.dataframe(df, use_container_width=True, height=250)
+        window = st.slider("Ventana (días guardados)", 1, 30, 7, key="hist_window")
+        roll = hist.rolling(window)
+        if not roll.empty:
+            total = roll[roll["plataforma"] == TOTAL].set_index("day")[["nuevos", "mantenidos", "eliminados"]]
+            st.line_chart(total)
+            st.dataframe(roll, use_container_width=True, height=250)
+
+def deadlines_panel_ui() -> None:
+    queue = st.session_state[APP_KEY].get("deadlines")
+    if queue is None or not len(queue):
+        return
+    with st.expander("⏰ Descuentos por vencer (todo lo notificado hoy)", expanded=False):
+        n = st.number_input("Próximos días hábiles", min_value=0, max_value=60, value=5, step=1, key="deadline_days")
         try:
-            df_mod = build_modificados_table(rows_simit, df_y_any)
+            due = queue.due_within(int(n))
         except Exception as e:
-            st.session_state[APP_KEY]["df_modificados"] = pd.DataFrame()
-            st.error(f"No fue posible generar 'Modificados': {e}")
-        else:
-            st.session_state[APP_KEY]["df_modificados"] = df_mod
-    else:
-        st.session_state[APP_KEY]["df_modificados"] = pd.DataFrame()
+            st.warning(f"No fue posible calcular los vencimientos: {e}")
+            return
+        st.caption(f"{len(due)} plazos vencen en los próximos {int(n)} días hábiles")
+        st.dataframe(due, use_container_width=True, height=300)
 
 # -------------------- UI por pestaña --------------------
 def platform_tab_ui(name: str) -> None:
@@ -217,6 +271,9 @@ def main():
     load_custom_css()
     init_state()
     render_main_header()
+    if PARSE_MODE != PARSE_MODE_ENV:
+        render_alert(f"COMPARENDOS_PARSE_MODE={PARSE_MODE_ENV!r} no es válido ({' | '.join(PARSE_MODES)}); "
+                     "se usa 'auto'.", "warning", "warning")
 
     # === 1) Carga de archivos ===
     render_section_header("📁 Gestión de Archivos")
@@ -233,8 +290,12 @@ def main():
         )
         if resumen is not None:
             try:
-                df_prev = read_yesterday_summary(resumen)
+                data = resumen.getvalue()
+                digest = content_digest(data)
+                df_prev = _load_summary_upload(digest, data)
                 st.session_state[APP_KEY]["yesterday_summary_df"] = df_prev
+                st.session_state[APP_KEY]["yesterday_summary_digest"] = digest
+                st.session_state[APP_KEY]["yesterday_summary_source"] = ""
                 render_alert(f"Resumen cargado exitosamente: {len(df_prev)} filas procesadas", "success", "success")
             except Exception as e:
                 render_alert(f"Error al leer el Resumen de AYER: {e}", "warning", "warning")
@@ -249,12 +310,38 @@ def main():
         )
         if comp is not None:
             try:
-                df_any = pd.read_excel(comp, header=None)
-                st.session_state[APP_KEY]["yesterday_any_df"] = df_any
-                render_alert(f"Excel cargado para comparativa ({len(df_any)} filas)", "info", "info")
+                data = comp.getvalue()
+                digest = content_digest(data)
+                y_index = _load_comparison_upload(digest, data)
+                st.session_state[APP_KEY]["yesterday_any_df"] = None
+                st.session_state[APP_KEY]["yesterday_index"] = y_index
+                st.session_state[APP_KEY]["yesterday_any_digest"] = digest
+                st.session_state[APP_KEY]["yesterday_source"] = ""
+                render_alert(f"Excel cargado para comparativa ({len(y_index)} comparendos)", "info", "info")
             except Exception as e:
                 render_alert(f"Error al leer el Excel de AYER: {e}", "warning", "warning")
 
+        st.checkbox("✏️ Modificados en todas las plataformas con notificación", key="modificados_all",
+                    help="SIMIT, FENIX, Magdalena, Soledad y Bolívar contra AYER en una pasada; "
+                         "la tabla indica qué plataforma reportó el cambio.")
+
+        # Sin Excel/Resumen subidos, AYER sale del último día guardado en el histórico local
+        use_history = st.checkbox("📚 Usar histórico local como AYER", value=True, key="snapshot_enabled",
+                                  help=f"Lee el último día guardado en {DEFAULT_DB_PATH}; "
+                                       "los archivos subidos tienen prioridad.")
+        if use_history and (comp is None or resumen is None):
+            try:
+                use_snapshot_as_yesterday(
+                    st.session_state[APP_KEY], _get_store(DEFAULT_DB_PATH), date.today().isoformat(),
+                    comparison=comp is None, summary=resumen is None,
+                )
+            except Exception as e:
+                render_alert(f"No fue posible leer el histórico local: {e}", "warning", "warning")
+        # Siempre a la vista: qué parte de AYER viene del histórico y de qué día
+        notice = snapshot_notice(st.session_state[APP_KEY], date.today().isoformat())
+        if notice:
+            render_alert(notice[1], notice[0], notice[0])
+
     with c_btns:
         st.markdown("**⚡ Acciones**")
         if st.button(f"{get_icon('process')} Procesar", type="primary", use_container_width=True):
@@ -266,6 +353,14 @@ def main():
             clear_all()
             render_alert("Todos los datos han sido limpiados", "info", "info")
 
+        with st.expander("⏱️ Medición", expanded=False):
+            st.checkbox("Medir tiempos por etapa", key="profile_enabled",
+                        help="CPU, filas y tiempo por etapa y por plataforma (el parseo corre en serie)")
+            st.checkbox("Pico de memoria (tracemalloc)", key="profile_memory",
+                        disabled=not st.session_state.get("profile_enabled", False))
+            st.checkbox("Perfil cProfile descargable", key="profile_cprofile",
+                        disabled=not st.session_state.get("profile_enabled", False))
+
     st.markdown("---")
 
     # === 2) Pestañas (texto) ===
@@ -282,8 +377,7 @@ def main():
     coact_list = st.session_state[APP_KEY].get("coactivos_simit", [])
     if coact_list:  # Solo mostrar si hay cobros coactivos
         render_section_header("⚖️ Cobros Coactivos (SIMIT)")
-        co_cols = ["numero_coactivo","fecha_resolucion","placa","organismo","codigo_infraccion","estado","valor","interes","valor_total","plataforma"]
-        df_coact = pd.DataFrame(coact_list, columns=co_cols)
+        df_coact = pd.DataFrame(coact_list, columns=COACTIVOS_COLS)
         st.dataframe(df_coact, use_container_width=True, height=300)
         st.markdown("---")
 
@@ -294,7 +388,9 @@ def main():
     if df_today.empty:
         render_alert("Sin datos procesados. Pega el texto en las pestañas y pulsa \"Procesar\" para comenzar.", "info", "info")
     else:
-        st.dataframe(df_today, use_container_width=True, height=380)
+        st.dataframe(conteo_frame(st.session_state[APP_KEY]), use_container_width=True, height=380)
+    timing_panel_ui()
+    deadlines_panel_ui()
     
     # === 3.1) KPIs de comparativa ===
     counts = st.session_state[APP_KEY].get("counts", {"nuevos": 0, "mantenidos": 0, "eliminados": 0})
@@ -334,48 +430,22 @@ def main():
         render_alert(f"No hay datos disponibles para mostrar {view_mode}. Procesa los datos primero.", "info", "info")
         return
 
+    history_panel_ui()
+
     # === 6) Descarga Excel ===
     render_section_header("💾 Exportación de Resultados")
     
     c_dl1, c_dl2 = st.columns([1, 3])
     with c_dl1:
-        df_raw  = st.session_state[APP_KEY]["df_raw"]
+        df_raw  = raw_frame(st.session_state[APP_KEY])
         df_today = st.session_state[APP_KEY]["df_today"]
-        three   = st.session_state[APP_KEY]["three_tables"]
-        df_mod  = st.session_state[APP_KEY]["df_modificados"]
 
         if not df_today.empty or not df_raw.empty:
-            sheets: Dict[str, pd.DataFrame] = {}
-
-            if not df_raw.empty:
-                resumen_name = f"Resumen {datetime.now().strftime('%d-%m-%y')}"
-                sheets[resumen_name] = df_raw
-
-            if not df_today.empty:
-                sheets["Conteo"] = df_today
-
-            if isinstance(three, dict):
-                if "NUEVOS" in three and not three["NUEVOS"].empty:
-                    sheets["Nuevos"] = three["NUEVOS"]
-                if "MANTENIDOS" in three and not three["MANTENIDOS"].empty:
-                    sheets["Mantenidos"] = three["MANTENIDOS"]
-                if "ELIMINADOS" in three and not three["ELIMINADOS"].empty:
-                    sheets["Eliminados"] = three["ELIMINADOS"]
-
-            if isinstance(df_mod, pd.DataFrame) and not df_mod.empty:
-                sheets["Modificados"] = df_mod
-
-            # Agregar cobros coactivos al Excel si existen
-            coact_list = st.session_state[APP_KEY].get("coactivos_simit", [])
-            if coact_list:
-                co_cols = ["numero_coactivo","fecha_resolucion","placa","organismo","codigo_infraccion","estado","valor","interes","valor_total","plataforma"]
-                df_coact = pd.DataFrame(coact_list, columns=co_cols)
-                if not df_coact.empty:
-                    sheets["Cobros coactivos"] = df_coact
+            sheets = report_sheets(st.session_state[APP_KEY])
 
             if sheets:
                 ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-                xlsx_bytes = dfs_to_excel_bytes(sheets)
+                xlsx_bytes = _build_report_bytes(_sheets_fingerprint(sheets), sheets)
                 st.download_button(
                     f"{get_icon('download')} Descargar Reporte Completo",
                     data=xlsx_bytes,
@@ -388,6 +458,8 @@ def main():
                 render_alert("No hay datos procesados para exportar aún.", "info", "info")
         else:
             render_alert("Procesa algunos datos primero para habilitar la exportación.", "info", "info")
+        if not df_today.empty:
+            save_day_ui()
     
     with c_dl2:
         if not df_today.empty:
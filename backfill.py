@@ -4,7 +4,10 @@ import pandas as pd
 import re
 from typing import List, Dict, Any, Optional
 
+from aggregator import PlatformBits
+
 EXPECTED_COLS = ["numero_comparendo", "fecha_imposicion", "fecha_notificacion", "placa", "plataforma"]
+_PLATS_SEP_RE = re.compile(r"[-,/;]+")
 
 def _normalize_df_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -39,26 +42,18 @@ def _normalize_df_columns(df: pd.DataFrame) -> pd.DataFrame:
 
     if c_plats is not None:
         # Hoja "Conteo": reconstruimos filas por plataforma dividiendo el string 'plataformas'
-        rows: List[Dict[str, Any]] = []
-        for _, r in df.iterrows():
-            plataformas_raw = str(r[c_plats]) if c_plats is not None else ""
-            plataformas = [p.strip() for p in re.split(r"[-,/;]+", plataformas_raw) if p.strip()]
-            if not plataformas:
-                plataformas = [""]  # sin info
-
-            base = {
-                "numero_comparendo": r[c_num]  if c_num  is not None else "",
-                "fecha_imposicion":  r[c_imp]  if c_imp  is not None else "",
-                "fecha_notificacion":r[c_not]  if c_not  is not None else "",
-                "placa":             r[c_pla]  if c_pla  is not None else "",
-            }
-            for p in plataformas:
-                rr = dict(base)
-                rr["plataforma"] = p
-                rows.append(rr)
-
-        out = pd.DataFrame(rows, columns=EXPECTED_COLS)
-        return out
+        # (se divide una vez por texto distinto y se expande con explode)
+        texts = df[c_plats].map(str)
+        split = {t: [p.strip() for p in _PLATS_SEP_RE.split(t) if p.strip()] or [""]  # sin info
+                 for t in texts.unique().tolist()}
+        out = pd.DataFrame({
+            "numero_comparendo": df[c_num]  if c_num  is not None else "",
+            "fecha_imposicion":  df[c_imp]  if c_imp  is not None else "",
+            "fecha_notificacion":df[c_not]  if c_not  is not None else "",
+            "placa":             df[c_pla]  if c_pla  is not None else "",
+            "plataforma":        texts.map(split),
+        }, index=df.index)
+        return out.explode("plataforma").reset_index(drop=True)[EXPECTED_COLS]
 
     # Fallback vacío (no se reconocen columnas)
     return pd.DataFrame(columns=EXPECTED_COLS)
@@ -91,24 +86,36 @@ def read_yesterday_summary(xlsx_file) -> pd.DataFrame:
     df_norm = df_norm[df_norm["numero_comparendo"].astype(str).str.strip() != ""].reset_index(drop=True)
     return df_norm[EXPECTED_COLS]
 
+def split_backfill_rows(df_prev: pd.DataFrame, platform_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Filas tipo parsers de varias plataformas en una pasada: cada fila del DF normalizado
+    (una por plataforma) se marca con el bit de su plataforma (sin distinguir mayúsculas)
+    y cada plataforma pedida se filtra con un AND.
+    """
+    out: Dict[str, List[Dict[str, Any]]] = {p: [] for p in platform_names}
+    if df_prev is None or df_prev.empty or not platform_names:
+        return out
+    bits = PlatformBits([str(p).strip().lower() for p in platform_names])
+    plat_bits = df_prev["plataforma"].astype(str).str.strip().str.lower().map(
+        {lab: bits.bit(lab) for lab in bits.labels}).fillna(0).astype("int64")
+    present = int(plat_bits.drop_duplicates().sum())
+    cols = {c: df_prev[c].map(str).str.strip() for c in EXPECTED_COLS[:-1]}
+    for p in platform_names:
+        bit = bits.bit(str(p).strip().lower())
+        if not bit & present:
+            continue
+        sel = (plat_bits & bit) != 0
+        out[p] = [
+            {"numero_comparendo": n, "fecha_imposicion": fi, "fecha_notificacion": fn, "placa": pl, "plataforma": p}
+            for n, fi, fn, pl in zip(*(cols[c][sel].tolist() for c in EXPECTED_COLS[:-1]))
+        ]
+    return out
+
 def build_backfill_rows(df_prev: pd.DataFrame, platform_name: str) -> List[Dict[str, Any]]:
     """
     A partir del DF normalizado (una fila por plataforma), devuelve rows tipo parsers
     solo de la plataforma pedida.
+    Se conserva por compatibilidad (API pública original); el pipeline usa split_backfill_rows,
+    que resuelve todas las plataformas caídas en una pasada.
     """
-    if df_prev is None or df_prev.empty:
-        return []
-    plat = str(platform_name).strip().lower()
-    mask = df_prev["plataforma"].astype(str).str.strip().str.lower() == plat
-    subset = df_prev[mask]
-
-    rows: List[Dict[str, Any]] = []
-    for _, r in subset.iterrows():
-        rows.append({
-            "numero_comparendo":   str(r["numero_comparendo"]).strip(),
-            "fecha_imposicion":    str(r["fecha_imposicion"]).strip(),
-            "fecha_notificacion":  str(r["fecha_notificacion"]).strip(),
-            "placa":               str(r["placa"]).strip(),
-            "plataforma":          platform_name,
-        })
-    return rows
+    return split_backfill_rows(df_prev, [platform_name])[platform_name]
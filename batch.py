@@ -0,0 +1,227 @@
+# batch.py
+"""
+Proceso diario sin interfaz (cron / lotes de días o clientes).
+
+Cada carpeta de entrada tiene un .txt por plataforma con el texto tal como se pega
+en la app (p. ej. SIMIT.txt, FENIX.txt, Medellín.txt o medellin.txt). Si la carpeta
+trae 'resumen.xlsx' y/o 'comparativa.xlsx' se usan esos; si no, los de --resumen / --comparativa.
+
+Ejemplo:
+    python batch.py datos/2024-05-02 datos/2024-05-03 --comparativa ayer.xlsx --out reportes --jobs 4
+
+Al final imprime en stdout un JSON con los tiempos por etapa de cada carpeta.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import time
+import unicodedata
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from backfill import read_yesterday_summary
+from export_utils import dfs_to_excel_bytes
+from pipeline import (
+    PLATFORMS, content_digest, new_state, raw_frame, run_pipeline, report_sheets, use_snapshot_as_yesterday,
+    snapshot_notice, save_snapshot,
+)
+from parsers import PARSE_MODES
+from profiling import StageProfiler
+from snapshot_store import DEFAULT_KEEP_DAYS, SnapshotStore
+from yesterday_index import YesterdayIndex
+
+REPORT_NAME = "reporte_comparendos_{name}.xlsx"
+
+def _fold(s: str) -> str:
+    """minúsculas sin tildes ni espacios: 'Santa Marta' / 'santa_marta' -> 'santamarta'."""
+    s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+    return "".join(ch for ch in s.lower() if ch.isalnum())
+
+_PLATFORM_BY_FOLD = {_fold(p): p for p in PLATFORMS}
+
+def read_platform_texts(folder: str) -> Dict[str, str]:
+    """{plataforma: texto} a partir de los .txt de la carpeta (las que no estén quedan vacías)."""
+    texts = {p: "" for p in PLATFORMS}
+    for fname in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(fname)
+        platform = _PLATFORM_BY_FOLD.get(_fold(stem))
+        if ext.lower() == ".txt" and platform:
+            with open(os.path.join(folder, fname), encoding="utf-8-sig") as fh:
+                texts[platform] = fh.read()
+    return texts
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as fh:
+        return fh.read()
+
+def _pick(folder: str, name: str, default: Optional[str]) -> Optional[str]:
+    local = os.path.join(folder, name)
+    return local if os.path.isfile(local) else default
+
+def folder_day(folder: str) -> str:
+    """Día (YYYY-MM-DD) de la carpeta si su nombre lo es; si no, hoy."""
+    name = os.path.basename(os.path.normpath(folder))
+    try:
+        return date.fromisoformat(name).isoformat()
+    except ValueError:
+        return date.today().isoformat()
+
+def run_folder(
+    folder: str,
+    out_dir: str,
+    resumen: Optional[str] = None,
+    comparativa: Optional[str] = None,
+    down: Optional[List[str]] = None,
+    parse_mode: str = "serial",
+    profile: bool = False,
+    trace_memory: bool = False,
+    cprofile_dir: Optional[str] = None,
+    db: Optional[str] = None,
+    modificados_all: bool = False,
+    db_keep_days: int = DEFAULT_KEEP_DAYS,
+    save_partial: bool = False,
+) -> Dict[str, Any]:
+    """Procesa una carpeta y escribe su reporte. Devuelve el resumen de tiempos/conteos (serializable)."""
+    t_start = time.perf_counter()
+    seconds: Dict[str, float] = {}
+    state = new_state()
+    state["inputs"] = read_platform_texts(folder)
+    state["modificados_all"] = modificados_all
+    for p in down or []:
+        if p in state["platform_down"]:
+            state["platform_down"][p] = True
+
+    t0 = time.perf_counter()
+    resumen = _pick(folder, "resumen.xlsx", resumen)
+    if resumen:
+        data = _read_bytes(resumen)
+        state["yesterday_summary_df"] = read_yesterday_summary(resumen)
+        state["yesterday_summary_digest"] = content_digest(data)
+    comparativa = _pick(folder, "comparativa.xlsx", comparativa)
+    if comparativa:
+        data = _read_bytes(comparativa)
+        state["yesterday_any_df"] = None
+        state["yesterday_index"] = YesterdayIndex.from_workbook(comparativa, detect=True)
+        state["yesterday_any_digest"] = content_digest(data)
+    store = SnapshotStore(db) if db else None
+    day = folder_day(folder)
+    yesterday_day = None
+    if store is not None and not (comparativa and resumen):
+        yesterday_day = use_snapshot_as_yesterday(state, store, day, comparison=not comparativa, summary=not resumen)
+    seconds["load_yesterday"] = time.perf_counter() - t0
+
+    profiler = StageProfiler(enabled=profile or bool(cprofile_dir), trace_memory=trace_memory,
+                             use_cprofile=bool(cprofile_dir))
+    messages = run_pipeline(state, parse_mode=parse_mode, profiler=profiler)
+    notice = snapshot_notice(state, day)
+    if notice:
+        messages.insert(0, notice)
+    seconds.update(state["stage_seconds"])
+
+    name = os.path.basename(os.path.normpath(folder))
+    t0 = time.perf_counter()
+    sheets = report_sheets(state)
+    report_path = ""
+    if sheets:
+        os.makedirs(out_dir, exist_ok=True)
+        report_path = os.path.join(out_dir, REPORT_NAME.format(name=name))
+        with open(report_path, "wb") as fh:
+            fh.write(dfs_to_excel_bytes(sheets))
+    seconds["export"] = time.perf_counter() - t0
+
+    if store is not None and not state["df_today"].empty:
+        t0 = time.perf_counter()
+        try:
+            save_snapshot(state, store, day, keep_days=db_keep_days, allow_partial=save_partial)
+        except ValueError as e:  # no se guarda un día incompleto como AYER de mañana
+            messages.append(("warning", f"No se guardó en el histórico: {e}"))
+        seconds["save_snapshot"] = time.perf_counter() - t0
+
+    if cprofile_dir:
+        os.makedirs(cprofile_dir, exist_ok=True)
+        with open(os.path.join(cprofile_dir, f"{name}.prof"), "wb") as fh:
+            fh.write(profiler.cprofile_dump())
+
+    counts = dict(state.get("counts", {}))
+    counts["crudo"] = len(raw_frame(state))
+    counts["conteo"] = len(state["df_today"])
+    counts["modificados"] = len(state["df_modificados"])
+    counts["coactivos"] = len(state["coactivos_simit"])
+    result = {
+        "folder": folder,
+        "day": day,
+        "yesterday_snapshot": yesterday_day,
+        "report": report_path,
+        "seconds": {k: round(v, 4) for k, v in seconds.items()},
+        "total_seconds": round(time.perf_counter() - t_start, 4),
+        "counts": counts,
+        "messages": [{"level": lvl, "text": txt} for lvl, txt in messages],
+    }
+    if profiler.enabled:
+        result["profile"] = profiler.records
+    return result
+
+def _run_folder_safe(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return run_folder(**kwargs)
+    except Exception as e:  # una carpeta rota no detiene el lote
+        return {"folder": kwargs["folder"], "error": f"{type(e).__name__}: {e}"}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Procesa carpetas de textos por plataforma y genera el reporte Excel.")
+    ap.add_argument("folders", nargs="+", help="Carpetas con un .txt por plataforma (una por día o cliente)")
+    ap.add_argument("--resumen", help="Excel 'Resumen de AYER' (backfill de plataformas caídas)")
+    ap.add_argument("--comparativa", help="Excel de AYER para la comparativa y Modificados")
+    ap.add_argument("--modificados-todas", action="store_true",
+                    help="Modificados de todas las plataformas con fecha de notificación (no solo SIMIT)")
+    ap.add_argument("--down", action="append", default=[], choices=PLATFORMS, metavar="PLATAFORMA",
+                    help="Plataforma caída (se toma del Resumen de AYER); repetible")
+    ap.add_argument("--out", default="reportes", help="Carpeta de salida de los reportes (por defecto: reportes)")
+    ap.add_argument("--jobs", type=int, default=1, help="Carpetas procesadas en paralelo (procesos)")
+    ap.add_argument("--parse-mode", default=None, choices=PARSE_MODES,
+                    help="Modo de parseo dentro de cada carpeta (por defecto: auto con --jobs 1, serial si no)")
+    ap.add_argument("--profile", action="store_true", help="Medir CPU y filas por etapa y por plataforma")
+    ap.add_argument("--memory", action="store_true", help="Con --profile: pico de memoria por etapa (tracemalloc)")
+    ap.add_argument("--cprofile-dir", help="Guardar un volcado cProfile (<carpeta>.prof) por carpeta aquí")
+    ap.add_argument("--db", help="Histórico SQLite: AYER sale del último día guardado (si no hay Excel) "
+                                 "y cada carpeta se guarda con su día (nombre YYYY-MM-DD o hoy); fuerza --jobs 1")
+    ap.add_argument("--db-dias", type=int, default=DEFAULT_KEEP_DAYS,
+                    help=f"Con --db: días guardados que se conservan, 0 = todos (por defecto: {DEFAULT_KEEP_DAYS})")
+    ap.add_argument("--guardar-incompleto", action="store_true",
+                    help="Con --db: guardar también carpetas a las que les falta alguna plataforma")
+    args = ap.parse_args(argv)
+
+    parse_mode = args.parse_mode or ("auto" if args.jobs <= 1 else "serial")
+    jobs = [
+        {"folder": f, "out_dir": args.out, "resumen": args.resumen, "comparativa": args.comparativa,
+         "down": args.down, "parse_mode": parse_mode, "profile": args.profile,
+         "trace_memory": args.memory, "cprofile_dir": args.cprofile_dir, "db": args.db,
+         "modificados_all": args.modificados_todas, "db_keep_days": args.db_dias,
+         "save_partial": args.guardar_incompleto}
+        for f in args.folders
+    ]
+    if args.db:
+        # Cada día usa al anterior como AYER: en orden y de a uno
+        jobs.sort(key=lambda j: folder_day(j["folder"]))
+
+    t0 = time.perf_counter()
+    if args.jobs <= 1 or len(jobs) == 1 or args.db:
+        results = [_run_folder_safe(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(_run_folder_safe, jobs))
+
+    summary = {
+        "jobs": args.jobs,
+        "wall_seconds": round(time.perf_counter() - t0, 4),
+        "results": results,
+    }
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 1 if any("error" in r for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# Benchmarks de rendimiento (datos sintéticos deterministas). Ver benchmarks/run.py.
@@ -0,0 +1,155 @@
+# benchmarks/generators.py
+"""
+Generadores deterministas (misma semilla => mismo texto) con el formato que entiende cada
+parser de parsers.PARSERS, más los Excel de AYER que los acompañan.
+
+    python -m benchmarks.generators datos/bench_100k --records 100000
+
+escribe una carpeta lista para batch.py: un .txt por plataforma, comparativa.xlsx y resumen.xlsx.
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from parsers import PARSERS
+
+# Participación de cada plataforma en el total de registros pegados
+PLATFORM_SHARE: Dict[str, float] = {
+    "SIMIT": 0.30, "FENIX": 0.15,
+    "Medellín": 0.06, "Bello": 0.06, "Itagüí": 0.06, "Manizales": 0.06, "Cali": 0.06,
+    "Magdalena": 0.05, "Soledad": 0.05, "Bolívar": 0.08, "Santa Marta": 0.07,
+}
+MUNICIPAL = ("Medellín", "Bello", "Itagüí", "Manizales", "Cali")
+KEY_POOL_RATIO = 0.6      # claves distintas / registros: un comparendo aparece en ~1.7 plataformas
+YESTERDAY_OVERLAP = 0.8   # fracción del Excel de AYER que sigue vigente hoy
+COACTIVO_EVERY = 25       # un bloque de cobro coactivo cada N comparendos SIMIT
+HEADER_ROW = 7            # fila (1-based) del encabezado en el Excel de comparativa
+_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# -------------------- Piezas --------------------
+def _num(k: int) -> str:
+    return f"{7689000000000000000 + k:019d}"
+
+def _plate(rng: random.Random) -> str:
+    return "".join(rng.choice(_LETTERS) for _ in range(3)) + f"{rng.randrange(1000):03d}"
+
+def _dmy(rng: random.Random, year: int = 2024) -> str:
+    return f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{year}"
+
+def _iso(rng: random.Random, year: int = 2024) -> str:
+    return f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+def _keys_for(rng: random.Random, n: int, pool: int) -> List[int]:
+    return [rng.randrange(pool) for _ in range(n)]
+
+# -------------------- Un generador por formato --------------------
+def gen_simit(rng: random.Random, keys: List[int]) -> str:
+    """Bloques de comparendo (número / Multa / 'Fecha imposición:' con tabs) y cada tanto un cobro coactivo."""
+    out: List[str] = []
+    for i, k in enumerate(keys):
+        notif = rng.choice([_dmy(rng), _dmy(rng), "No aplica"])
+        out += [_num(k), "Multa", "Secretaría de Tránsito",
+                f"Fecha imposición:\t{_dmy(rng)}\t{notif}\t{_plate(rng)}", "Pendiente", f"$ {rng.randint(100, 999)}.{rng.randint(100, 999)}", ""]
+        if i % COACTIVO_EVERY == COACTIVO_EVERY - 1:
+            total = rng.randint(300, 999)
+            out += [f"{rng.randint(10**8, 10**9 - 1)}", "Multa",
+                    f"Fecha resolución:\t{_dmy(rng)}\t{_plate(rng)}\tSecretaría de Movilidad",
+                    f"C{rng.randint(1, 40):02d}", f"Pendiente de pago\t$ {total}.000",
+                    f"Interés\t$ {rng.randint(10, 99)}.000", f"$ {total + 50}.000", ""]
+    return "\n".join(out)
+
+def gen_fenix(rng: random.Random, keys: List[int]) -> str:
+    return "\n".join(
+        f"Comparendo - Tránsito\tVIGENTE\t{_num(k)}\t{_plate(rng)}\t{_dmy(rng)}\t{_dmy(rng)}"
+        f"\t$ 604.000\t$ 0\t$ 0\t$ 604.000\tPersonal"
+        for k in keys
+    )
+
+def gen_municipal(rng: random.Random, keys: List[int]) -> str:
+    """<NIT> <PLACA> <NUMERO> <FECHA> ... (Medellín, Bello, Itagüí, Manizales, Cali)."""
+    return "\n".join(f"890{rng.randint(100000, 999999)} {_plate(rng)} {_num(k)} {_dmy(rng)} C29 Pendiente" for k in keys)
+
+def gen_orden(rng: random.Random, keys: List[int]) -> str:
+    """Bloques '# Orden:' (Magdalena, Soledad): número y en la línea siguiente la notificación ISO."""
+    return "\n".join(f"# Orden: {_num(k)} Comparendo\nNotificado el {_iso(rng)}\nValor $ 604.000" for k in keys)
+
+def gen_bolivar(rng: random.Random, keys: List[int]) -> str:
+    return "\n".join(f"{_num(k)}\n{_dmy(rng)}\n\nNO\n$ 604.000" for k in keys)
+
+def gen_santamarta(rng: random.Random, keys: List[int]) -> str:
+    out: List[str] = []
+    for k in keys:
+        out += [f"Aviso del comparendo {_num(k)} {_dmy(rng)} {_dmy(rng)}", f"aviso_{_num(k)}.pdf"]
+    return "\n".join(out)
+
+GENERATORS = {
+    "SIMIT": gen_simit,
+    "FENIX": gen_fenix,
+    **{p: gen_municipal for p in MUNICIPAL},
+    "Magdalena": gen_orden,
+    "Soledad": gen_orden,
+    "Bolívar": gen_bolivar,
+    "Santa Marta": gen_santamarta,
+}
+assert set(GENERATORS) == set(PARSERS), "Falta un generador para alguna plataforma de parsers.PARSERS"
+
+def platform_texts(records: int, seed: int = 0) -> Tuple[Dict[str, str], int]:
+    """({plataforma: texto}, tamaño del pool de claves) con ~'records' comparendos en total."""
+    pool = max(1, int(records * KEY_POOL_RATIO))
+    texts: Dict[str, str] = {}
+    for name in PARSERS:
+        rng = random.Random(f"{seed}:{name}")
+        n = int(records * PLATFORM_SHARE[name])
+        texts[name] = GENERATORS[name](rng, _keys_for(rng, n, pool))
+    return texts, pool
+
+# -------------------- Excel de AYER --------------------
+def yesterday_frame(records: int, pool: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Excel de comparativa como lo devuelve pd.read_excel(header=None): encabezado en la fila 7,
+    B=placa, C=comparendo, H=imposición, I=notificación. ~YESTERDAY_OVERLAP de las claves siguen hoy.
+    """
+    rng = random.Random(f"{seed}:ayer")
+    n = max(1, int(pool * 0.9))
+    ncols = 12
+    head = [[None] * ncols for _ in range(HEADER_ROW)]
+    head[HEADER_ROW - 1] = ["#", "Placa", "Comparendo", "Organismo", "Estado", "Valor", "Infracción",
+                            "Fecha imposición", "Fecha notificación", "Medio", "Observación", "Gestor"]
+    rows = []
+    for i in range(n):
+        k = rng.randrange(pool) if rng.random() < YESTERDAY_OVERLAP else pool + i
+        rows.append([i + 1, _plate(rng), _num(k), "Tránsito", "VIGENTE", 604000, "C29",
+                     pd.Timestamp(_iso(rng)), rng.choice([pd.Timestamp(_iso(rng)), _dmy(rng), np.nan, "No aplica"]),
+                     "Personal", rng.choice([np.nan, "sin novedad", f"revisar {_dmy(rng)}"]), "bench"])
+    return pd.DataFrame(head + rows)
+
+def yesterday_summary_frame(texts: Dict[str, str]) -> pd.DataFrame:
+    """'Resumen de AYER' (hoja Resumen del reporte) a partir del parseo de los textos generados."""
+    from pipeline import concat_rows
+    from parsers import parse_platform
+    return concat_rows({name: parse_platform(name, t) for name, t in texts.items()})
+
+def write_day_folder(out_dir: str, records: int, seed: int = 0) -> None:
+    """Carpeta lista para batch.py: <Plataforma>.txt + comparativa.xlsx + resumen.xlsx."""
+    from export_utils import dfs_to_excel_bytes
+    os.makedirs(out_dir, exist_ok=True)
+    texts, pool = platform_texts(records, seed)
+    for name, text in texts.items():
+        with open(os.path.join(out_dir, f"{name}.txt"), "w", encoding="utf-8") as fh:
+            fh.write(text)
+    yesterday_frame(records, pool, seed).to_excel(os.path.join(out_dir, "comparativa.xlsx"), header=False, index=False)
+    with open(os.path.join(out_dir, "resumen.xlsx"), "wb") as fh:
+        fh.write(dfs_to_excel_bytes({"Resumen": yesterday_summary_frame(texts)}))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Genera una carpeta de datos sintéticos para batch.py")
+    ap.add_argument("out_dir")
+    ap.add_argument("--records", type=int, default=10_000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    write_day_folder(args.out_dir, args.records, args.seed)
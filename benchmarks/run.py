@@ -0,0 +1,146 @@
+# benchmarks/run.py
+"""
+Mide cada etapa del proceso con datos sintéticos (benchmarks/generators.py) a varios tamaños
+y compara contra una línea base guardada.
+
+    python -m benchmarks.run                          # 10k, 100k y 1M, compara con baseline.json
+    python -m benchmarks.run --sizes 10000,100000 --repeat 3   # sin 1M (la corrida de 1M tarda varios minutos)
+    python -m benchmarks.run --save-baseline          # reescribe benchmarks/baseline.json
+    python -m benchmarks.run --threshold 0.25         # regresión = >25% más lento que la base (por defecto 50%)
+
+La etapa "yesterday_workbook" mide YesterdayIndex.from_workbook sobre el Excel de AYER generado
+(escrito antes de medir, como lo sube la app); no incluye la escritura del .xlsx.
+
+Sale con código 1 si alguna etapa es más lenta que la base por encima del umbral
+(y por más de --min-seconds, para no marcar ruido en etapas de milisegundos).
+"""
+from __future__ import annotations
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from benchmarks.generators import platform_texts, yesterday_frame, yesterday_summary_frame
+from export_utils import dfs_to_excel_bytes
+from pipeline import new_state, report_sheets, run_pipeline
+from profiling import StageProfiler
+from yesterday_index import YesterdayIndex
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_THRESHOLD = 0.50   # 50% más lento que la base (las corridas cortas tienen ruido)
+DEFAULT_MIN_SECONDS = 0.05
+DOWN_PLATFORM = "Cali"     # se marca caída para medir también el backfill
+
+def run_once(records: int, seed: int = 0, export: bool = True) -> Dict[str, float]:
+    """{etapa: segundos} de una corrida completa sobre datos generados de ~'records' registros."""
+    texts, pool = platform_texts(records, seed)
+    df_any = yesterday_frame(records, pool, seed)
+    df_summary = yesterday_summary_frame(texts)
+
+    workbook = io.BytesIO()
+    df_any.to_excel(workbook, header=False, index=False)
+    del df_any
+
+    seconds: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    y_index = YesterdayIndex.from_workbook(io.BytesIO(workbook.getvalue()), detect=True)
+    seconds["yesterday_workbook"] = time.perf_counter() - t0
+
+    state = new_state()
+    state["inputs"].update(texts)
+    state["platform_down"][DOWN_PLATFORM] = True
+    state["yesterday_summary_df"] = df_summary
+    state["yesterday_summary_digest"] = f"bench-resumen-{records}-{seed}"
+    state["yesterday_any_df"] = None
+    state["yesterday_index"] = y_index
+    state["yesterday_any_digest"] = f"bench-ayer-{records}-{seed}"
+
+    prof = StageProfiler(enabled=True)
+    run_pipeline(state, profiler=prof)
+    for rec in prof.records:
+        seconds[rec["etapa"]] = rec["wall_s"]
+
+    if export:
+        t0 = time.perf_counter()
+        dfs_to_excel_bytes(report_sheets(state))
+        seconds["export"] = time.perf_counter() - t0
+    return seconds
+
+def run_suite(sizes: List[int], repeat: int = 1, seed: int = 0, export: bool = True) -> Dict[str, Dict[str, float]]:
+    """{tamaño: {etapa: mejor tiempo de 'repeat' corridas}}."""
+    results: Dict[str, Dict[str, float]] = {}
+    for n in sizes:
+        best: Dict[str, float] = {}
+        for _ in range(repeat):
+            for stage, s in run_once(n, seed, export).items():
+                best[stage] = min(s, best.get(stage, s))
+        results[str(n)] = {k: round(v, 4) for k, v in best.items()}
+        print(f"[{n:>9,} registros] " + "  ".join(f"{k}={v:.3f}s" for k, v in results[str(n)].items()
+                                                  if not k.startswith("parse:")), file=sys.stderr)
+    return results
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float = DEFAULT_THRESHOLD, min_seconds: float = DEFAULT_MIN_SECONDS) -> List[Dict[str, Any]]:
+    """Etapas más lentas que la base: (actual - base) > threshold * base y > min_seconds."""
+    regressions: List[Dict[str, Any]] = []
+    for size, stages in current.items():
+        base_stages = baseline.get(size, {})
+        for stage, s in stages.items():
+            b = base_stages.get(stage)
+            if b is None:
+                continue
+            if s - b > threshold * b and s - b > min_seconds:
+                regressions.append({"size": int(size), "stage": stage, "baseline_s": b, "current_s": s,
+                                    "ratio": round(s / b, 2) if b else None})
+    return regressions
+
+def _meta() -> Dict[str, Any]:
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark por etapa con datos sintéticos.")
+    ap.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                    help="Tamaños separados por coma (por defecto: 10000,100000,1000000)")
+    ap.add_argument("--repeat", type=int, default=1, help="Corridas por tamaño; se guarda la mejor")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--no-export", action="store_true", help="No medir la exportación a Excel")
+    ap.add_argument("--baseline", default=BASELINE_PATH, help="Archivo JSON de línea base")
+    ap.add_argument("--save-baseline", action="store_true", help="Guardar los resultados como nueva línea base")
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Fracción de lentitud tolerada")
+    ap.add_argument("--min-seconds", type=float, default=DEFAULT_MIN_SECONDS, help="Diferencia mínima para marcar")
+    args = ap.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = run_suite(sizes, repeat=args.repeat, seed=args.seed, export=not args.no_export)
+    report: Dict[str, Any] = {"meta": _meta(), "results": results}
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+            fh.write("\n")
+    elif os.path.isfile(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        report["baseline_meta"] = baseline.get("meta", {})
+        report["regressions"] = compare(results, baseline.get("results", {}), args.threshold, args.min_seconds)
+
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 1 if report.get("regressions") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
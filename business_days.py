@@ -0,0 +1,157 @@
+# business_days.py
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import holidays
+except ImportError:  # pragma: no cover
+    holidays = None  # lo reportamos en la UI
+
+WEEKMASK = "1111100"  # lunes a viernes
+DEFAULT_FIRST_YEAR = 2015
+DEFAULT_LAST_YEAR = date.today().year + 2
+
+# Plazos de descuento en días hábiles contados desde el día siguiente a la notificación
+DAYS_50 = 11       # 50%: hasta el día hábil 11
+DAYS_25_FROM = 12  # 25%: desde el día hábil 12 ...
+DAYS_25_TO = 26    # ... hasta el 26
+
+Windows = Tuple[str, str, str]  # (limite_50, desde_25, hasta_25) como YYYY-MM-DD
+_EMPTY_WINDOWS: Windows = ("", "", "")
+_WINDOWS_CACHE_MAX = 100_000
+_windows_cache: Dict[str, Windows] = {}
+
+# -------------------- Suma día a día (referencia / fuera de rango) --------------------
+def business_add_loop(start: datetime, n_days: int, co_holidays=None) -> datetime:
+    """
+    Suma n días hábiles a partir del día siguiente a 'start'.
+    n_days=1 => primer día hábil después de start.
+
+    co_holidays: colección con fechas festivas (p. ej., holidays.Colombia()).
+                 Si es None, se asume "sin festivos" y solo se excluyen fines de semana.
+    """
+    if n_days <= 0:
+        return start
+    if co_holidays is None:
+        # Evita errores si no pasamos festivos explícitos
+        class _NoHolidays(set):
+            def __contains__(self, d):  # noqa: N802
+                return False
+        co_holidays = _NoHolidays()
+
+    cur = start
+    added = 0
+    while added < n_days:
+        cur += timedelta(days=1)
+        if (cur.weekday() < 5) and (cur not in co_holidays):
+            added += 1
+    return cur
+
+@lru_cache(maxsize=1)
+def _co_holidays_lazy():
+    return holidays.Colombia()  # se expande solo con los años consultados
+
+# -------------------- Calendario precalculado --------------------
+class BusinessCalendar:
+    """
+    Días hábiles de Colombia (lunes a viernes sin festivos) precalculados para
+    [first_year, last_year] como np.busdaycalendar: sumar días hábiles a miles
+    de fechas es una sola llamada a np.busday_offset.
+    """
+
+    def __init__(self, first_year: int = DEFAULT_FIRST_YEAR, last_year: int = DEFAULT_LAST_YEAR):
+        if holidays is None:
+            raise RuntimeError("Falta el paquete 'holidays' para calcular días hábiles")
+        self.first_year = first_year
+        self.last_year = last_year
+        # Un año extra: 26 días hábiles desde diciembre terminan en enero del año siguiente
+        co = holidays.Colombia(years=range(first_year, last_year + 2))
+        self.holidays = np.array(sorted(co.keys()), dtype="datetime64[D]")
+        self.busdaycal = np.busdaycalendar(weekmask=WEEKMASK, holidays=self.holidays)
+        self._lo = np.datetime64(f"{first_year}-01-01", "D")
+        self._hi = np.datetime64(f"{last_year + 1}-01-01", "D")
+
+    def covers(self, days: np.ndarray) -> np.ndarray:
+        return (days >= self._lo) & (days < self._hi)
+
+    def add(self, days: np.ndarray, n_days: int) -> np.ndarray:
+        """n-ésimo día hábil DESPUÉS de cada fecha (la fecha misma no cuenta), vectorizado."""
+        # roll="backward" lleva un sábado/festivo al hábil anterior; desde ahí +n coincide con el conteo día a día
+        return np.busday_offset(days, n_days, roll="backward", busdaycal=self.busdaycal)
+
+@lru_cache(maxsize=4)
+def get_calendar(first_year: int = DEFAULT_FIRST_YEAR, last_year: int = DEFAULT_LAST_YEAR) -> BusinessCalendar:
+    return BusinessCalendar(first_year, last_year)
+
+# -------------------- Ventanas de descuento --------------------
+def _parse_iso(d: str) -> Optional[datetime]:
+    if not d:
+        return None
+    try:
+        return datetime.strptime(d, "%Y-%m-%d")
+    except Exception:
+        return None
+
+def _compute_windows(notif_dates: List[str], calendar: BusinessCalendar) -> Dict[str, Windows]:
+    out: Dict[str, Windows] = {}
+    parsed = {d: _parse_iso(d) for d in notif_dates}
+    valid = [d for d, dt in parsed.items() if dt is not None]
+    for d, dt in parsed.items():
+        if dt is None:
+            out[d] = _EMPTY_WINDOWS
+    if not valid:
+        return out
+
+    days = np.array([parsed[d].date() for d in valid], dtype="datetime64[D]")
+    inside = calendar.covers(days)
+    if inside.any():
+        in_days = days[inside]
+        cols = [calendar.add(in_days, n).astype(str) for n in (DAYS_50, DAYS_25_FROM, DAYS_25_TO)]
+        for d, l50, f25, t25 in zip(np.array(valid, dtype=object)[inside], *cols):
+            out[d] = (str(l50), str(f25), str(t25))
+    # Fuera del rango precalculado: suma día a día con festivos perezosos
+    for d, is_in in zip(valid, inside):
+        if not is_in:
+            d0, co = parsed[d], _co_holidays_lazy()
+            out[d] = tuple(business_add_loop(d0, n, co).strftime("%Y-%m-%d")
+                           for n in (DAYS_50, DAYS_25_FROM, DAYS_25_TO))
+    return out
+
+def discount_windows(notif_dates: Iterable[str], calendar: Optional[BusinessCalendar] = None) -> List[Windows]:
+    """
+    Ventanas (limite_50, desde_25, hasta_25) para cada fecha de notificación YYYY-MM-DD
+    ('' si la fecha no es válida o no hay 'holidays'). Las fechas ya vistas salen de caché;
+    las nuevas se calculan juntas en una llamada vectorizada.
+    """
+    notif_dates = ["" if d is None else str(d) for d in notif_dates]
+    if holidays is None:
+        return [_EMPTY_WINDOWS] * len(notif_dates)
+    known: Dict[str, Windows] = {}
+    missing: List[str] = []
+    for d in dict.fromkeys(notif_dates):
+        w = _windows_cache.get(d)
+        if w is None:
+            missing.append(d)
+        else:
+            known[d] = w
+    if missing:
+        computed = _compute_windows(missing, calendar or get_calendar())
+        if len(_windows_cache) + len(computed) > _WINDOWS_CACHE_MAX:
+            _windows_cache.clear()
+        _windows_cache.update(computed)
+        known.update(computed)
+    return [known[d] for d in notif_dates]
+
+def discount_windows_frame(notif: pd.Series, calendar: Optional[BusinessCalendar] = None) -> pd.DataFrame:
+    """Versión por columna: DataFrame con limite_50, desde_25, hasta_25 alineado al índice de 'notif'."""
+    cols = ["limite_50", "desde_25", "hasta_25"]
+    if notif.empty:
+        return pd.DataFrame(columns=cols, index=notif.index, dtype=object)
+    codes, uniques = pd.factorize(notif.fillna("").astype(str))
+    win = np.array(discount_windows(list(uniques), calendar), dtype=object).reshape(-1, 3)
+    return pd.DataFrame(win[codes], index=notif.index, columns=cols)
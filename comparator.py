@@ -1,87 +1,28 @@
 from __future__ import annotations
-import re
 import pandas as pd
-from typing import Tuple, List, Dict, Any, Set
-from datetime import datetime
-from aggregator import canonical_num  # solo dígitos
-from collections import defaultdict
-
-# -------------------- Regex auxiliares --------------------
-_PLATE_INLINE_RE = re.compile(
-    r"([A-Za-z]{3}\d{3}|[A-Za-z]{3}\d{2}[A-Za-z]|[A-Za-z]{2}\d{3}[A-Za-z])"
-)
-_DATE_INLINE_RE = re.compile(r"\b(\d{1,2}/\d{1,2}/\d{2,4})\b")
-_ALNUM_TOKEN_RE = re.compile(r"[A-Za-z0-9]{11,}")
+from typing import Tuple, Dict
+from aggregator import PlatformBits, MASK_COL
+from parsers import PARSERS
+from yesterday_index import YesterdayIndex
 
 # -------------------- Utils --------------------
+DIFF_COLS = ["plataformas_agregadas", "plataformas_retiradas"]
 
-def _platforms_map_from_summary(df_prev_summary: pd.DataFrame) -> Dict[str, str]:
-    """
-    Construye un mapa: clave_canónica -> 'Plataforma1-Plataforma2-...'
-    a partir del DataFrame normalizado del Resumen de AYER (una fila por plataforma).
-    """
-    if df_prev_summary is None or df_prev_summary.empty:
-        return {}
-    acc: Dict[str, Set[str]] = defaultdict(set)
-    for _, r in df_prev_summary.iterrows():
-        num = str(r.get("numero_comparendo", "")).strip()
-        key = canonical_num(num)
-        if not key:
-            continue
-        plat = str(r.get("plataforma", "")).strip()
-        if not plat:
-            continue
-        acc[key].add(plat)
-    # join estable por orden alfabético (insensible a mayúsculas)
-    return {k: "-".join(sorted(list(v), key=str.lower)) for k, v in acc.items()}
-def _to_str_date_like(v: Any) -> str:
-    if pd.isna(v):
-        return ""
-    if isinstance(v, (pd.Timestamp, datetime)):
-        return v.strftime("%Y-%m-%d")
-    s = str(v).strip()
-    for fmt in ("%d/%m/%Y", "%d/%m/%y"):
-        try:
-            return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
-        except ValueError:
-            pass
-    try:
-        return pd.to_datetime(s, errors="raise").strftime("%Y-%m-%d")
-    except Exception:
-        return s
-
-def _find_plate_in_row(row_vals: List[str]) -> str:
-    for raw in row_vals:
-        if not raw or str(raw).lower() in ("nan", "none"):
-            continue
-        s = re.sub(r"[\s\-]", "", str(raw).upper())
-        m = _PLATE_INLINE_RE.search(s)
-        if m:
-            return m.group(1).upper()
-    return ""
-
-def _find_dates_in_row(row_vals: List[str]) -> List[str]:
-    out: List[str] = []
-    for raw in row_vals:
-        if not raw:
-            continue
-        for m in _DATE_INLINE_RE.findall(str(raw)):
-            out.append(_to_str_date_like(m))
-    return out
-
-def _iter_comparendos_in_cell(cell_text: str):
+def _summary_masks(df_prev_summary: pd.DataFrame, bits: PlatformBits) -> pd.Series:
     """
-    - Normaliza removiendo espacios, guiones, puntos, slashes, underscores, etc.
-    - Busca tokens alfanuméricos y filtra los que tengan >=11 dígitos.
+    clave_canónica -> máscara de plataformas (bits de 'bits') a partir del DataFrame normalizado
+    del Resumen de AYER (una fila por plataforma). Una sola pasada: encode + OR por clave.
     """
-    if not cell_text:
-        return
-    s = str(cell_text)
-    s = re.sub(r"[\s\.\-_/]", "", s)  # <--- normalización importante
-    for m in _ALNUM_TOKEN_RE.finditer(s):
-        tok = m.group(0)
-        if sum(ch.isdigit() for ch in tok) >= 11:
-            yield tok
+    if df_prev_summary is None or df_prev_summary.empty or "numero_comparendo" not in df_prev_summary.columns:
+        return pd.Series(dtype="int64")
+    nums = df_prev_summary["numero_comparendo"].map(str).str.strip()
+    plats = (df_prev_summary["plataforma"].map(str).str.strip()
+             if "plataforma" in df_prev_summary.columns else pd.Series("", index=df_prev_summary.index))
+    keys = nums.str.replace(r"\D+", "", regex=True)
+    keep = (keys != "") & (plats != "")
+    if not keep.any():
+        return pd.Series(dtype="int64")
+    return bits.union_by(keys[keep], bits.encode(plats[keep]))
 
 # -------------------- Extracción AYER --------------------
 def extract_comparendos_rowwise_with_dates(
@@ -90,84 +31,63 @@ def extract_comparendos_rowwise_with_dates(
     date_notif_col_idx: int = 8,
     plate_col_idx: int = 1,
     header_row_excel_1based: int = 7,
+    detect_layout: bool = False,
 ) -> Tuple[Dict[str,str], set, Dict[str, Dict[str,str]]]:
-    y_original: Dict[str, str] = {}
-    yesterday_set = set()
-    y_data: Dict[str, Dict[str, str]] = {}
-
-    n_rows, n_cols = df_yesterday_any.shape if isinstance(df_yesterday_any, pd.DataFrame) else (0, 0)
-    data_start_idx = header_row_excel_1based
-
-    for i in range(min(data_start_idx, n_rows), n_rows):
-        row_vals = df_yesterday_any.iloc[i, :].astype(str).str.strip().tolist()
-
-        comps_in_row: List[str] = []
-        for v in row_vals:
-            if not v or v.lower() in ("nan", "none"):
-                continue
-            for token in _iter_comparendos_in_cell(v):
-                comps_in_row.append(token)
-
-        if not comps_in_row:
-            continue
-
-        imp_ayer = _to_str_date_like(df_yesterday_any.iat[i, date_imp_col_idx]) if date_imp_col_idx < n_cols else ""
-        notif_ayer = _to_str_date_like(df_yesterday_any.iat[i, date_notif_col_idx]) if date_notif_col_idx < n_cols else ""
-
-        if not imp_ayer or not notif_ayer:
-            dates_inline = _find_dates_in_row(row_vals)
-            if not imp_ayer and len(dates_inline) >= 1:
-                imp_ayer = dates_inline[0]
-            if not notif_ayer and len(dates_inline) >= 2:
-                notif_ayer = dates_inline[1]
-
-        placa_ayer = ""
-        if plate_col_idx < n_cols:
-            val = df_yesterday_any.iat[i, plate_col_idx]
-            if not pd.isna(val):
-                placa_ayer = re.sub(r"[\s\-]", "", str(val).upper()).strip()
-        if not placa_ayer:
-            placa_ayer = _find_plate_in_row(row_vals)
+    """
+    Compatibilidad: construye el YesterdayIndex y lo devuelve como (y_original, yesterday_set, y_data).
+    detect_layout=True: encabezado y columnas se detectan (los índices dados quedan de respaldo).
+    """
+    return YesterdayIndex.build(
+        df_yesterday_any,
+        date_imp_col_idx=date_imp_col_idx,
+        date_notif_col_idx=date_notif_col_idx,
+        plate_col_idx=plate_col_idx,
+        header_row_excel_1based=header_row_excel_1based,
+        detect=detect_layout,
+    ).as_legacy_maps()
 
-        for val in comps_in_row:
-            key = canonical_num(val)  # solo dígitos
-            if not key:
-                continue
-            yesterday_set.add(key)
-            if key not in y_original:
-                y_original[key] = val
-            if key not in y_data:
-                y_data[key] = {
-                    "imp_ayer": imp_ayer,
-                    "notif_ayer": notif_ayer,
-                    "placa_ayer": placa_ayer,
-                }
+# -------------------- HOY --------------------
+TABLE_COLS = ["numero_comparendo","fecha_imposicion","fecha_notificacion","placa","plataformas","numero_veces","estado"] + DIFF_COLS
 
-    return y_original, yesterday_set, y_data
+def _col_str(df: pd.DataFrame, col: str) -> pd.Series:
+    """Columna como str sin espacios ('' si no existe), igual que str(r.get(col, '')).strip()."""
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[col].map(str).str.strip()
 
-# -------------------- HOY --------------------
-def _today_key_set(df_today: pd.DataFrame) -> Tuple[set, Dict[str, Dict[str,str]]]:
-    tset = set()
-    tdata: Dict[str, Dict[str,str]] = {}
+def _today_frame(df_today: pd.DataFrame, bits: PlatformBits) -> pd.DataFrame:
+    """
+    Primera fila de HOY por clave canónica: clave, datos para mostrar, texto 'plataformas' y máscara '_mask'.
+    'df_today' trae el texto 'plataformas' o la máscara (MASK_COL, con los bits de 'bits').
+    """
+    cols = ["clave"] + TABLE_COLS[:6] + ["_mask"]
     if df_today is None or df_today.empty:
-        return tset, tdata
-
-    for _, r in df_today.iterrows():
-        num = str(r.get("numero_comparendo", "")).strip()
-        key = canonical_num(num)  # solo dígitos (coherente con AYER)
-        if not key:
-            continue
-        tset.add(key)
-        if key not in tdata:
-            tdata[key] = {
-                "numero_comparendo": num,
-                "fecha_imposicion": str(r.get("fecha_imposicion", "")).strip(),
-                "fecha_notificacion": str(r.get("fecha_notificacion", "")).strip(),
-                "placa": str(r.get("placa", "")).strip(),
-                "plataformas": str(r.get("plataformas", r.get("plataforma",""))).strip(),
-                "numero_veces": r.get("numero_veces",""),
-            }
-    return tset, tdata
+        return pd.DataFrame(columns=cols)
+    nums = _col_str(df_today, "numero_comparendo")
+    if MASK_COL in df_today.columns:
+        masks = df_today[MASK_COL]
+        texts = bits.render(masks)
+    else:
+        col = "plataformas" if "plataformas" in df_today.columns else "plataforma"
+        texts = _col_str(df_today, col)
+        masks = bits.encode_joined(texts)
+    out = pd.DataFrame({
+        "clave": nums.str.replace(r"\D+", "", regex=True),  # solo dígitos (coherente con AYER)
+        "numero_comparendo": nums,
+        "fecha_imposicion": _col_str(df_today, "fecha_imposicion"),
+        "fecha_notificacion": _col_str(df_today, "fecha_notificacion"),
+        "placa": _col_str(df_today, "placa"),
+        "plataformas": texts,
+        "numero_veces": df_today["numero_veces"] if "numero_veces" in df_today.columns else "",
+        "_mask": masks,
+    }, columns=cols)
+    return out[out["clave"] != ""].drop_duplicates("clave")
+
+def _and_not(a: pd.Series, b: pd.Series) -> pd.Series:
+    """a & ~b elemento a elemento (máscaras int64 o, con muchas plataformas, enteros de Python)."""
+    if a.dtype == object or b.dtype == object:
+        return pd.Series([x & ~y for x, y in zip(a.tolist(), b.tolist())], index=a.index, dtype=object)
+    return a & ~b
 
 # -------------------- Construcción de tablas --------------------
 def build_three_tables(
@@ -178,69 +98,83 @@ def build_three_tables(
     plate_col_idx: int = 1,
     header_row_excel_1based: int = 7,
     df_prev_summary: pd.DataFrame | None = None,
+    yesterday_index: YesterdayIndex | None = None,
+    platform_bits: PlatformBits | None = None,
+    detect_layout: bool = False,
 ) -> Dict[str, pd.DataFrame]:
-    y_original, yesterday_set, y_data = extract_comparendos_rowwise_with_dates(
-        df_yesterday_any,
-        date_imp_col_idx=date_imp_col_idx,
-        date_notif_col_idx=date_notif_col_idx,
-        plate_col_idx=plate_col_idx,
-        header_row_excel_1based=header_row_excel_1based,
-    )
-    platmap_ayer: Dict[str, str] = _platforms_map_from_summary(df_prev_summary) if df_prev_summary is not None else {}
-
-    today_set, today_map = _today_key_set(df_today)
-
-    nuevos     = sorted(today_set - yesterday_set)
-    eliminados = sorted(yesterday_set - today_set)
-    mantenidos = sorted(today_set & yesterday_set)
-
-    cols = ["numero_comparendo","fecha_imposicion","fecha_notificacion","placa","plataformas","numero_veces","estado"]
-    rows_nuevos, rows_mant, rows_elim = [], [], []
-
-    for k in nuevos:
-        t = today_map.get(k, {})
-        rows_nuevos.append({
-            "numero_comparendo": t.get("numero_comparendo",""),
-            "fecha_imposicion": t.get("fecha_imposicion",""),
-            "fecha_notificacion": t.get("fecha_notificacion",""),
-            "placa": t.get("placa",""),
-            "plataformas": t.get("plataformas",""),
-            "numero_veces": t.get("numero_veces",""),
-            "estado": "NUEVO",
-        })
-
-    for k in mantenidos:
-        t = today_map.get(k, {})
-        rows_mant.append({
-            "numero_comparendo": t.get("numero_comparendo",""),
-            "fecha_imposicion": t.get("fecha_imposicion",""),
-            "fecha_notificacion": t.get("fecha_notificacion",""),
-            "placa": t.get("placa",""),
-            "plataformas": t.get("plataformas",""),
-            "numero_veces": t.get("numero_veces",""),
-            "estado": "MANTENIDO",
-        })
-
-    for k in eliminados:
-        orig = y_original.get(k, k)
-        d = y_data.get(k, {})
-        rows_elim.append({
-            "numero_comparendo": orig,
-            "fecha_imposicion": d.get("imp_ayer",""),
-            "fecha_notificacion": d.get("notif_ayer",""),
-            "placa": d.get("placa_ayer",""),
-            "plataformas": platmap_ayer.get(k, ""),
-            "numero_veces": "",
-            "estado": "ELIMINADO",
-        })
-
-    df_nuevos = pd.DataFrame(rows_nuevos, columns=cols)
-    df_mant   = pd.DataFrame(rows_mant,   columns=cols)
-    df_elim   = pd.DataFrame(rows_elim,   columns=cols)
-
-    for dfx in (df_nuevos, df_mant, df_elim):
-        if not dfx.empty:
-            dfx.sort_values(["numero_comparendo"], kind="stable", inplace=True)
-            dfx.reset_index(drop=True, inplace=True)
-
-    return {"NUEVOS": df_nuevos, "MANTENIDOS": df_mant, "ELIMINADOS": df_elim}
+    """
+    Clasifica HOY vs AYER en NUEVOS / MANTENIDOS / ELIMINADOS.
+    Si se pasa 'yesterday_index' (ya construido para el Excel de AYER) se usa tal cual
+    y 'df_yesterday_any' se ignora; si no, se construye aquí con los índices de columna dados
+    (o detectados, con detect_layout=True).
+    'df_today' puede traer el texto 'plataformas' o la máscara (MASK_COL) junto con 'platform_bits'.
+
+    Con 'df_prev_summary', cada fila lleva además el cambio de plataformas frente a AYER
+    (DIFF_COLS: las que aparecieron y las que dejaron de reportarlo, en el orden de 'platform_bits'
+    o, si no se pasa, el de parsers.PARSERS);
+    sin Resumen de AYER esas columnas quedan vacías.
+
+    Un solo merge externo por clave canónica (HOY x índice de AYER, con indicador) se parte en
+    las tres tablas; cada una queda ordenada por numero_comparendo.
+    """
+    if MASK_COL in df_today.columns and platform_bits is None:
+        raise ValueError("df_today trae máscara de plataformas: falta platform_bits")
+    # Copia: las etiquetas de AYER se registran aquí sin tocar los bits del Conteo
+    bits = PlatformBits(platform_bits.labels if platform_bits is not None else list(PARSERS))
+    if yesterday_index is None:
+        yesterday_index = YesterdayIndex.build(
+            df_yesterday_any,
+            date_imp_col_idx=date_imp_col_idx,
+            date_notif_col_idx=date_notif_col_idx,
+            plate_col_idx=plate_col_idx,
+            header_row_excel_1based=header_row_excel_1based,
+            detect=detect_layout,
+        )
+    today = _today_frame(df_today, bits)
+    yesterday = yesterday_index.to_frame()
+    # Solo claves + posición de cada lado: las columnas de datos no pasan por el merge (conservan su tipo)
+    merged = (today[["clave"]].assign(_pos_hoy=range(len(today)))
+              .merge(yesterday[["clave"]].assign(_pos_ayer=range(len(yesterday))),
+                     on="clave", how="outer", indicator=True))
+
+    # AYER por clave (Resumen): texto alfabético (ELIMINADOS) y máscara sin distinguir mayúsculas (diff)
+    has_summary = df_prev_summary is not None and not df_prev_summary.empty
+    y_masks = _summary_masks(df_prev_summary, bits) if has_summary else pd.Series(dtype="int64")
+    platmap_ayer = bits.render(y_masks, alphabetical=True)
+    y_fold = y_masks.map({m: bits.fold_case(m) for m in y_masks.unique().tolist()})
+
+    def with_diff(dfx: pd.DataFrame, t_masks: pd.Series) -> pd.DataFrame:
+        if not has_summary:
+            return dfx.assign(plataformas_agregadas="", plataformas_retiradas="")
+        t = t_masks.map({m: bits.fold_case(int(m)) for m in t_masks.unique().tolist()}).astype(bits.dtype)
+        y = dfx["clave"].map(y_fold).fillna(0).astype(bits.dtype)
+        return dfx.assign(plataformas_agregadas=bits.render(_and_not(t, y)).values,
+                          plataformas_retiradas=bits.render(_and_not(y, t)).values)
+
+    def table(part: str, estado: str) -> pd.DataFrame:
+        pos = merged.loc[merged["_merge"] == part]
+        if pos.empty:
+            return pd.DataFrame(columns=TABLE_COLS)
+        if part == "right_only":
+            y = yesterday.iloc[pos["_pos_ayer"].astype(int)]
+            dfx = pd.DataFrame({
+                "clave": y["clave"],
+                "numero_comparendo": y["numero_comparendo"],
+                "fecha_imposicion": y["imp_ayer"],
+                "fecha_notificacion": y["notif_ayer"],
+                "placa": y["placa_ayer"],
+                "plataformas": y["clave"].map(platmap_ayer).fillna(""),
+                "numero_veces": "",
+            })
+            dfx = with_diff(dfx, pd.Series(0, index=dfx.index, dtype=bits.dtype))
+        else:
+            dfx = today.iloc[pos["_pos_hoy"].astype(int)]
+            dfx = with_diff(dfx, dfx["_mask"].astype(bits.dtype))
+        dfx = dfx.assign(estado=estado).sort_values(["numero_comparendo", "clave"], kind="stable")
+        return dfx[TABLE_COLS].reset_index(drop=True)
+
+    return {
+        "NUEVOS": table("left_only", "NUEVO"),
+        "MANTENIDOS": table("both", "MANTENIDO"),
+        "ELIMINADOS": table("right_only", "ELIMINADO"),
+    }
@@ -0,0 +1,108 @@
+from __future__ import annotations
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+# Formatos dd/mm/(yyyy|yy) que aparecen en las plataformas y en el Excel de AYER
+DATE_FORMATS = ("%d/%m/%Y", "%d/%m/%y")
+DATE_CACHE_SIZE = 65536  # literales distintos memorizados (las mismas fechas se repiten miles de veces)
+
+_ISO_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_DIGIT_RE = re.compile(r"\d")
+# Sin dígitos, pandas solo reconoce nombres de mes en inglés ('March', 'Jan') o 'now'/'today'
+_WORD_DATE_RE = re.compile(r"jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec", re.IGNORECASE)
+_VOLATILE = ("now", "today")  # dependen del reloj: nunca se memorizan
+_EMPTY_LITERALS = ("nan", "none", "no aplica")
+
+# -------------------- Núcleo (literal ya sin espacios) --------------------
+def _dmy_to_iso(s: str) -> str:
+    if "/" not in s:
+        return ""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return ""
+
+def _pandas_to_iso(s: str) -> str:
+    try:
+        return pd.to_datetime(s, errors="raise").strftime("%Y-%m-%d")
+    except Exception:
+        return ""
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _dmy_cached(s: str) -> str:
+    return _dmy_to_iso(s)
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _loose_cached(s: str) -> str:
+    iso = _dmy_to_iso(s)
+    if iso:
+        return iso
+    # Vía rápida: yyyy-mm-dd válido da lo mismo que pandas
+    if _ISO_RE.fullmatch(s):
+        try:
+            return datetime.strptime(s, "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    # Vía rápida: textos como 'No aplica' o 'En proceso notificación' nunca son fecha para pandas
+    if not _DIGIT_RE.search(s) and not _WORD_DATE_RE.search(s):
+        return ""
+    return _pandas_to_iso(s)
+
+def _loose_to_iso(s: str) -> str:
+    """ISO (YYYY-MM-DD) del literal con dd/mm/(yy|yyyy) y respaldo de pandas; '' si no es fecha."""
+    if s in _VOLATILE:
+        return _pandas_to_iso(s)
+    return _loose_cached(s)
+
+# -------------------- API por valor --------------------
+def to_iso_or_keep(text: str) -> str:
+    """Solo dd/mm/(yy|yyyy) -> YYYY-MM-DD; cualquier otro literal se devuelve tal cual (sin espacios)."""
+    t = (text or "").strip()
+    if not t:
+        return ""
+    return _dmy_cached(t) or t
+
+def to_iso_loose_or_keep(value: Any) -> str:
+    """
+    Fechas de celdas/textos heterogéneos -> YYYY-MM-DD.
+    NaN/None -> ''; Timestamp/datetime -> su fecha; texto no reconocido -> el literal tal cual.
+    """
+    if pd.isna(value):
+        return ""
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.strftime("%Y-%m-%d")
+    s = str(value).strip()
+    return _loose_to_iso(s) or s
+
+def to_iso_or_empty(value: Any) -> str:
+    """Como to_iso_loose_or_keep, pero devuelve '' para lo que no sea fecha ('No aplica', 'nan', ...)."""
+    if value is None or (isinstance(value, float) and pd.isna(value)) or value is pd.NaT:
+        return ""
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return pd.to_datetime(value).strftime("%Y-%m-%d")
+    txt = str(value).strip()
+    if not txt or txt.lower() in _EMPTY_LITERALS:
+        return ""
+    return _loose_to_iso(txt)
+
+# -------------------- API vectorizada --------------------
+def series_to_iso(s: pd.Series, fn: Callable[[Any], str] = to_iso_loose_or_keep) -> pd.Series:
+    """
+    Aplica 'fn' (to_iso_or_keep / to_iso_loose_or_keep / to_iso_or_empty) a una Serie
+    evaluando cada valor DISTINTO una sola vez.
+    """
+    if s.empty:
+        return pd.Series([], index=s.index, dtype=object)
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    values = [fn(u) for u in uniques]
+    # El último elemento cubre los nulos (código -1)
+    values.append(fn(np.nan) if (codes < 0).any() else "")
+    mapped = np.array(values, dtype=object)
+    return pd.Series(mapped[codes], index=s.index, dtype=object)
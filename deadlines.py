@@ -0,0 +1,176 @@
+# deadlines.py
+"""
+Vencimientos de descuento (50% / 25%) de TODO el portafolio notificado, no solo de 'Modificados'.
+
+    queue = DeadlineQueue()
+    queue.apply_conteo(conteo_frame(state), day="2024-05-03")   # o DeadlineQueue.from_store(store)
+    queue.due_within(5, today="2024-05-03")                       # vencen en los próximos 5 días hábiles
+
+Las ventanas salen de business_days.discount_windows_frame (calendario hábil vectorizado, una vez por
+fecha distinta) y se guardan en una lista ordenada (vence, clave) por tipo de descuento: las consultas
+son dos bisect. Cada Conteo nuevo solo toca las claves que aparecen, desaparecen o cambian de
+notificación/datos; el resto de la cola no se recalcula. Si se sabe qué claves cambiaron
+(apply_changes), ni siquiera se recorre el Conteo completo.
+"""
+from __future__ import annotations
+import argparse
+import sys
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from business_days import discount_windows_frame, get_calendar
+from date_utils import series_to_iso, to_iso_or_empty
+from snapshot_store import SnapshotStore, DEFAULT_DB_PATH
+
+DEADLINE_COLS = ["numero_comparendo", "placa", "plataformas", "fecha_notificacion",
+                 "descuento", "vence", "dias_habiles"]
+KINDS = {"50%": "limite_50", "25%": "hasta_25"}  # descuento -> columna de discount_windows_frame
+REBUILD_RATIO = 0.25  # si cambia más de esta fracción de la cola, se reordena entera en vez de insertar
+
+Entry = Tuple[str, str, str, str]  # (numero_comparendo, placa, plataformas, fecha_notificacion ISO)
+
+def _conteo_entries(df_conteo: pd.DataFrame) -> Dict[str, Entry]:
+    """clave canónica -> datos de la primera fila NOTIFICADA del Conteo (sin notificación no hay plazo)."""
+    if df_conteo is None or df_conteo.empty or "numero_comparendo" not in df_conteo.columns:
+        return {}
+    df = df_conteo.reindex(columns=["numero_comparendo", "placa", "plataformas", "fecha_notificacion"]).fillna("")
+    nums = df["numero_comparendo"].map(str).str.strip()
+    notif = series_to_iso(df["fecha_notificacion"], to_iso_or_empty)
+    keys = nums.str.replace(r"\D+", "", regex=True)
+    keep = (keys != "") & (notif != "")
+    data = zip(keys[keep].tolist(), nums[keep].tolist(),
+               df.loc[keep, "placa"].map(str).str.strip().tolist(),
+               df.loc[keep, "plataformas"].map(str).str.strip().tolist(), notif[keep].tolist())
+    out: Dict[str, Entry] = {}
+    for key, num, placa, plats, fn in data:
+        if key not in out:
+            out[key] = (num, placa, plats, fn)
+    return out
+
+class DeadlineQueue:
+    """Cola de vencimientos del portafolio: una lista ordenada por descuento, actualizada por diferencias."""
+
+    def __init__(self):
+        self.day: str = ""  # día del último Conteo aplicado
+        self.saved_at: str = ""  # marca del snapshot aplicado (sync)
+        self._entries: Dict[str, Entry] = {}
+        self._vence: Dict[str, Dict[str, str]] = {k: {} for k in KINDS}  # descuento -> clave -> vence
+        self._sorted: Dict[str, List[Tuple[str, str]]] = {k: [] for k in KINDS}  # descuento -> [(vence, clave)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # -------------------- Actualización --------------------
+    def apply_conteo(self, df_conteo: pd.DataFrame, day: str = "") -> Dict[str, int]:
+        """
+        Deja la cola igual al Conteo dado (el portafolio completo de ese día).
+        Devuelve cuántas claves entraron, cambiaron y salieron.
+        """
+        new = _conteo_entries(df_conteo)
+        return self._apply(new, [k for k in self._entries if k not in new], day)
+
+    def apply_changes(self, df_rows: pd.DataFrame, keys: Iterable[str], day: str = "") -> Dict[str, int]:
+        """
+        Como apply_conteo, pero solo para 'keys' (p. ej. IncrementalAggregate.last_changed):
+        'df_rows' son las filas del Conteo nuevo de esas claves; las que no aparecen salen de la cola.
+        """
+        new = _conteo_entries(df_rows)
+        return self._apply(new, [k for k in keys if k in self._entries and k not in new], day)
+
+    def _apply(self, new: Dict[str, Entry], removed: List[str], day: str) -> Dict[str, int]:
+        old = self._entries
+        changed = [k for k, e in new.items() if old.get(k) != e]
+        stats = {"nuevos": sum(1 for k in changed if k not in old),
+                 "cambiados": sum(1 for k in changed if k in old),
+                 "retirados": len(removed)}
+        self.day = day or self.day
+        if not changed and not removed:
+            return stats
+
+        win = discount_windows_frame(pd.Series([new[k][3] for k in changed], dtype=object))
+        rebuild = len(changed) + len(removed) > REBUILD_RATIO * max(len(old), 1)
+        for kind, col in KINDS.items():
+            vence, lst = self._vence[kind], self._sorted[kind]
+            for k in removed + changed:
+                v = vence.pop(k, None)
+                if v and not rebuild:
+                    del lst[bisect_left(lst, (v, k))]
+            for k, v in zip(changed, win[col].tolist()):
+                if v:
+                    vence[k] = v
+                    if not rebuild:
+                        insort(lst, (v, k))
+            if rebuild:
+                self._sorted[kind] = sorted((v, k) for k, v in vence.items())
+        for k in removed:
+            del old[k]
+        for k in changed:
+            old[k] = new[k]
+        return stats
+
+    def sync(self, store: SnapshotStore, day: Optional[str] = None) -> bool:
+        """Aplica el Conteo guardado de 'day' (por defecto el último día) si no es el ya aplicado."""
+        days = store.days()
+        day = day or (days[-1] if days else None)
+        if not day:
+            return False
+        saved_at = store.saved_at(day)
+        if (day, saved_at) == (self.day, self.saved_at):
+            return False
+        self.apply_conteo(store.load_table(day, "conteo"), day=day)
+        self.saved_at = saved_at
+        return True
+
+    @classmethod
+    def from_store(cls, store: SnapshotStore, day: Optional[str] = None) -> "DeadlineQueue":
+        queue = cls()
+        queue.sync(store, day)
+        return queue
+
+    # -------------------- Consultas --------------------
+    def due_within(self, n_business_days: int, today: Optional[str] = None, kinds: Tuple[str, ...] = tuple(KINDS)) -> pd.DataFrame:
+        """
+        Plazos que vencen desde 'today' (incluido) hasta su n-ésimo día hábil siguiente, ordenados
+        por fecha de vencimiento. 'dias_habiles' = días hábiles que faltan (0 = vence hoy).
+        """
+        today = today or date.today().isoformat()
+        cal = get_calendar()
+        start = np.datetime64(today, "D")
+        end = str(cal.add(np.array([start]), max(int(n_business_days), 0))[0])
+        rows = []
+        for kind in kinds:
+            lst = self._sorted[kind]
+            for v, k in lst[bisect_left(lst, (today, "")):bisect_right(lst, (end, "\uffff"))]:
+                num, placa, plats, fn = self._entries[k]
+                rows.append((num, placa, plats, fn, kind, v))
+        out = pd.DataFrame(rows, columns=DEADLINE_COLS[:-1])
+        if out.empty:
+            return pd.DataFrame(columns=DEADLINE_COLS)
+        out["dias_habiles"] = np.busday_count(start, out["vence"].to_numpy(dtype="datetime64[D]"),
+                                              busdaycal=cal.busdaycal)
+        return out.sort_values(["vence", "descuento", "numero_comparendo"], kind="stable").reset_index(drop=True)
+
+# -------------------- CLI --------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Comparendos cuyo descuento vence en los próximos N días hábiles.")
+    ap.add_argument("--db", default=DEFAULT_DB_PATH, help="Histórico SQLite (por defecto: %(default)s)")
+    ap.add_argument("--dias", type=int, default=5, help="Días hábiles hacia adelante (por defecto: 5)")
+    ap.add_argument("--hoy", default=None, help="Fecha de referencia YYYY-MM-DD (por defecto: hoy)")
+    ap.add_argument("--day", default=None, help="Día guardado a usar como portafolio (por defecto: el último)")
+    ap.add_argument("--out", default=None, help="Guardar como CSV en vez de imprimir")
+    args = ap.parse_args(argv)
+
+    queue = DeadlineQueue.from_store(SnapshotStore(args.db), args.day)
+    df = queue.due_within(args.dias, today=args.hoy)
+    if args.out:
+        df.to_csv(args.out, index=False)
+    else:
+        df.to_csv(sys.stdout, index=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
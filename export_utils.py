@@ -1,65 +1,81 @@
 from __future__ import annotations
 import io
+from typing import Any, Iterator, Optional, Tuple
+
 import pandas as pd
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
 from openpyxl.utils.cell import coordinate_to_tuple
 
-def dfs_to_excel_bytes(sheets: dict[str, pd.DataFrame]) -> bytes:
-    """
-    Exporta varias hojas a un solo .xlsx.
-    'sheets' es un dict: {"NombreHoja": DataFrame, ...}
-    """
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        for name, df in sheets.items():
-            df.to_excel(writer, index=False, sheet_name=name)
-    return output.getvalue()
+# Filas convertidas a la vez; el libro se escribe en modo write-only (streaming), así
+# la memoria extra queda acotada por este bloque y no por el libro completo.
+ROW_CHUNK = 10_000
 
-def df_to_excel_at_cell_bytes(df: pd.DataFrame, start_cell: str = "C7", sheet_name: str = "Comparativa") -> bytes:
-    """Escribe un DataFrame en una hoja nueva empezando EXACTAMENTE en start_cell (incluye encabezado)."""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = sheet_name
+_THIN = Side(style="thin")
+# Mismo estilo de encabezado que usa pandas.to_excel con openpyxl
+_HEADER_FONT = Font(bold=True)
+_HEADER_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+_HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
 
-    row0, col0 = coordinate_to_tuple(start_cell)  # (fila, columna)
+def _iter_value_rows(df: pd.DataFrame) -> Iterator[Tuple[Any, ...]]:
+    """Filas como tuplas de valores nativos (NaN/NaT -> None), convertidas por bloques de ROW_CHUNK."""
+    for start in range(0, len(df), ROW_CHUNK):
+        chunk = df.iloc[start:start + ROW_CHUNK].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
 
-    # Encabezados
-    for j, h in enumerate(df.columns):
-        ws.cell(row=row0, column=col0 + j, value=str(h))
+def _header_cells(ws, df: pd.DataFrame, styled: bool) -> list:
+    if not styled:
+        return [str(h) for h in df.columns]
+    cells = []
+    for h in df.columns:
+        c = WriteOnlyCell(ws, value=str(h))
+        c.font = _HEADER_FONT
+        c.border = _HEADER_BORDER
+        c.alignment = _HEADER_ALIGNMENT
+        cells.append(c)
+    return cells
 
-    # Datos
-    for i, (_, r) in enumerate(df.iterrows(), start=1):
-        for j, v in enumerate(r.tolist()):
-            ws.cell(row=row0 + i, column=col0 + j, value=None if pd.isna(v) else v)
+def _stream_sheet(wb: Workbook, name: str, df: pd.DataFrame, start_cell: Optional[str], styled_header: bool) -> None:
+    ws = wb.create_sheet(title=name)
+    row0, col0 = coordinate_to_tuple(start_cell) if start_cell else (1, 1)
+    for _ in range(row0 - 1):
+        ws.append([])
+    pad = [None] * (col0 - 1)
+    ws.append(pad + _header_cells(ws, df, styled_header))
+    for values in _iter_value_rows(df):
+        ws.append(pad + list(values))
 
+def _save(wb: Workbook) -> bytes:
+    if not wb.worksheets:
+        wb.create_sheet(title="Sheet")  # un libro vacío igual necesita una hoja
     buf = io.BytesIO()
     wb.save(buf)
     return buf.getvalue()
 
+def dfs_to_excel_bytes(sheets: dict[str, pd.DataFrame]) -> bytes:
+    """
+    Exporta varias hojas a un solo .xlsx.
+    'sheets' es un dict: {"NombreHoja": DataFrame, ...}
+    """
+    wb = Workbook(write_only=True)
+    for name, df in sheets.items():
+        _stream_sheet(wb, name, df, start_cell=None, styled_header=True)
+    return _save(wb)
+
+def df_to_excel_at_cell_bytes(df: pd.DataFrame, start_cell: str = "C7", sheet_name: str = "Comparativa") -> bytes:
+    """Escribe un DataFrame en una hoja nueva empezando EXACTAMENTE en start_cell (incluye encabezado)."""
+    wb = Workbook(write_only=True)
+    _stream_sheet(wb, sheet_name, df, start_cell=start_cell, styled_header=False)
+    return _save(wb)
+
 def dfs_to_excel_multi_at_cell_bytes(sheets: dict[str, pd.DataFrame], start_cell: str = "C7") -> bytes:
     """
     Crea un .xlsx con varias hojas. Cada DF se escribe desde start_cell (incluye encabezado).
     sheets = {"Nuevos": df_nuevos, "Mantenidos": df_mant, "Eliminados": df_elim}
     """
-    wb = Workbook()
-    first = True
-    row0, col0 = coordinate_to_tuple(start_cell)
-
+    wb = Workbook(write_only=True)
     for sheet_name, df in sheets.items():
-        ws = wb.active if first else wb.create_sheet(title=sheet_name)
-        if first:
-            ws.title = sheet_name
-            first = False
-
-        # Encabezados
-        for j, h in enumerate(df.columns):
-            ws.cell(row=row0, column=col0 + j, value=str(h))
-
-        # Datos
-        for i, (_, r) in enumerate(df.iterrows(), start=1):
-            for j, v in enumerate(r.tolist()):
-                ws.cell(row=row0 + i, column=col0 + j, value=None if pd.isna(v) else v)
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    return buf.getvalue()
+        _stream_sheet(wb, sheet_name, df, start_cell=start_cell, styled_header=False)
+    return _save(wb)
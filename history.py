@@ -0,0 +1,129 @@
+# history.py
+"""
+Comparaciones entre días guardados en el histórico (snapshot_store):
+  - compare_days(d1, d2): NUEVOS / MANTENIDOS / ELIMINADOS de d2 frente a d1 (mismas tablas que la comparativa diaria).
+  - trends(): por cada par de días consecutivos y por plataforma, cuántos comparendos entran, siguen y salen.
+  - rolling(window): esas cifras acumuladas en ventanas de N días guardados.
+
+Cada día se resume UNA vez en sus conjuntos de claves por plataforma y el conteo de cada par de días se
+guarda en la tabla 'transitions' de la misma base; un reporte de un mes solo calcula los pares nuevos.
+"""
+from __future__ import annotations
+import sqlite3
+from contextlib import closing
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import pandas as pd
+
+from comparator import build_three_tables
+from snapshot_store import SnapshotStore
+
+TOTAL = "TOTAL"  # fila con todas las plataformas juntas
+METRICS = ["nuevos", "mantenidos", "eliminados"]
+TREND_COLS = ["day", "dia_anterior", "plataforma"] + METRICS
+KEY_SETS_CACHE_MAX = 64  # días con sus conjuntos de claves en memoria
+
+_TRANSITIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transitions (
+    dia_anterior TEXT NOT NULL, day TEXT NOT NULL,
+    saved_anterior TEXT NOT NULL, saved_at TEXT NOT NULL,
+    plataforma TEXT NOT NULL, nuevos INTEGER, mantenidos INTEGER, eliminados INTEGER,
+    PRIMARY KEY (dia_anterior, day, plataforma)
+)
+"""
+
+KeySets = Dict[str, FrozenSet[str]]
+
+def _platform_order(plat: str) -> Tuple[bool, str]:
+    return plat == TOTAL, plat.lower()  # alfabético, TOTAL al final
+
+class History:
+    def __init__(self, store: SnapshotStore):
+        self.store = store
+        self._key_sets: Dict[Tuple[str, str], KeySets] = {}
+        with closing(sqlite3.connect(store.path)) as con, con:
+            con.execute(_TRANSITIONS_SCHEMA)
+
+    # -------------------- Claves por día --------------------
+    def key_sets(self, day: str) -> KeySets:
+        """{plataforma: claves del día} más TOTAL (todas); en caché mientras el día no se vuelva a guardar."""
+        cache_key = (day, self.store.saved_at(day))
+        sets = self._key_sets.get(cache_key)
+        if sets is not None:
+            return sets
+        with closing(sqlite3.connect(self.store.path)) as con:
+            pairs = con.execute(
+                "SELECT DISTINCT plataforma, clave FROM raw WHERE day = ? AND clave != ''", (day,)
+            ).fetchall()
+        acc: Dict[str, set] = {}
+        for plat, clave in pairs:
+            acc.setdefault(plat, set()).add(clave)
+        sets = {p: frozenset(v) for p, v in acc.items()}
+        sets[TOTAL] = frozenset(clave for _, clave in pairs)
+        if len(self._key_sets) >= KEY_SETS_CACHE_MAX:
+            self._key_sets.clear()
+        self._key_sets[cache_key] = sets
+        return sets
+
+    # -------------------- Dos días cualesquiera --------------------
+    def compare_days(self, d1: str, d2: str) -> Dict[str, pd.DataFrame]:
+        """Tablas NUEVOS / MANTENIDOS / ELIMINADOS de d2 contra d1 (d1 hace de AYER)."""
+        df_prev_summary, y_index = self.store.load_yesterday(d1)
+        df_today = self.store.load_table(d2, "conteo")
+        return build_three_tables(df_today, None, df_prev_summary=df_prev_summary, yesterday_index=y_index)
+
+    def transition(self, d1: str, d2: str) -> Dict[str, Dict[str, int]]:
+        """{plataforma: {nuevos, mantenidos, eliminados}} de d1 -> d2 (incluye TOTAL); se guarda en 'transitions'."""
+        s1, s2 = self.store.saved_at(d1), self.store.saved_at(d2)
+        with closing(sqlite3.connect(self.store.path)) as con:
+            rows = con.execute(
+                "SELECT plataforma, nuevos, mantenidos, eliminados FROM transitions "
+                "WHERE dia_anterior = ? AND day = ? AND saved_anterior = ? AND saved_at = ?",
+                (d1, d2, s1, s2),
+            ).fetchall()
+        if rows:
+            rows.sort(key=lambda r: _platform_order(r[0]))
+            return {p: {"nuevos": n, "mantenidos": m, "eliminados": e} for p, n, m, e in rows}
+
+        a, b = self.key_sets(d1), self.key_sets(d2)
+        out: Dict[str, Dict[str, int]] = {}
+        for plat in sorted(set(a) | set(b), key=_platform_order):
+            ka, kb = a.get(plat, frozenset()), b.get(plat, frozenset())
+            out[plat] = {"nuevos": len(kb - ka), "mantenidos": len(ka & kb), "eliminados": len(ka - kb)}
+        with closing(sqlite3.connect(self.store.path)) as con, con:
+            con.execute("DELETE FROM transitions WHERE dia_anterior = ? AND day = ?", (d1, d2))
+            con.executemany(
+                "INSERT INTO transitions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(d1, d2, s1, s2, p, c["nuevos"], c["mantenidos"], c["eliminados"]) for p, c in out.items()],
+            )
+        return out
+
+    # -------------------- Tendencias --------------------
+    def _days_between(self, start: Optional[str], end: Optional[str]) -> List[str]:
+        return [d for d in self.store.days() if (start is None or d >= start) and (end is None or d <= end)]
+
+    def trends(self, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """Una fila por (día, plataforma) con lo que cambió respecto al día guardado anterior."""
+        days = self._days_between(start, end)
+        prev = self.store.previous_day(days[0]) if days else None
+        rows = []
+        for day in days:
+            if prev is not None:
+                for plat, c in self.transition(prev, day).items():
+                    rows.append({"day": day, "dia_anterior": prev, "plataforma": plat, **c})
+            prev = day
+        return pd.DataFrame(rows, columns=TREND_COLS)
+
+    def rolling(self, window: int = 7, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """Como trends(), pero cada métrica sumada sobre los últimos 'window' días guardados de la plataforma."""
+        df = self.trends(start, end)
+        if df.empty:
+            return df
+        df = df.sort_values(["plataforma", "day"], kind="stable").reset_index(drop=True)
+        df[METRICS] = (
+            df.groupby("plataforma", sort=False)[METRICS]
+            .rolling(window, min_periods=1).sum()
+            .reset_index(level=0, drop=True)
+            .astype("int64")
+        )
+        return df.sort_values(["day", "plataforma"], kind="stable").reset_index(drop=True)
@@ -1,24 +1,25 @@
 from __future__ import annotations
+import atexit
+import multiprocessing
+import os
 import re
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
+
+from date_utils import DATE_FORMATS, to_iso_or_keep, to_iso_loose_or_keep
 
 Record = Dict[str, Any]
 
-DATE_PATTERNS = ["%d/%m/%Y", "%d/%m/%y"]
+# Subir cuando cambie la salida de algún parser: invalida los parseos memoizados en app.run_all.
+PARSER_VERSION = "1"
+
+DATE_PATTERNS = list(DATE_FORMATS)
 
 def normalize_date_or_keep(text: str) -> str:
     """Convierte a YYYY-MM-DD si 'text' es fecha dd/mm/(yy|yyyy). Si no, devuelve el literal tal cual."""
-    t = (text or "").strip()
-    if not t:
-        return ""
-    for fmt in DATE_PATTERNS:
-        try:
-            dt = datetime.strptime(t, fmt)
-            return dt.strftime("%Y-%m-%d")
-        except ValueError:
-            pass
-    return t  # puede ser 'No aplica', 'En proceso notificación', etc.
+    return to_iso_or_keep(text)  # puede ser 'No aplica', 'En proceso notificación', etc.
 
 def normalize_plate(text: str) -> str:
     """Placa upper sin espacios internos."""
@@ -68,6 +69,20 @@ def _extract_comparendo_token(line: str) -> str:
             return tok
     return ""
 
+def _simit_fecha_fields(li: str) -> Tuple[str, str, str]:
+    """(fecha_imposicion, fecha_notificacion, placa) de una línea 'Fecha imposición: ...'."""
+    fecha_imp, notif, placa = "", "", ""
+    tail = li.split(":", 1)[1].strip() if ":" in li else ""
+    # separa por tabs o por 2+ espacios
+    parts = re.split(r"\t+|\s{2,}", tail)
+    if parts:
+        fecha_imp = parts[0].strip()
+    if len(parts) > 1:
+        notif = parts[1].strip()
+    if len(parts) > 2:
+        placa = parts[2].strip()
+    return fecha_imp, notif, placa
+
 # --------------------------------------------------------------
 def parse_simit(text: str) -> List[Record]:
     """
@@ -95,15 +110,7 @@ def parse_simit(text: str) -> List[Record]:
         while j < n:
             li = lines[j]
             if li.startswith("Fecha imposición:") or li.startswith("Fecha imposicion:"):
-                tail = li.split(":", 1)[1].strip() if ":" in li else ""
-                # separa por tabs o por 2+ espacios
-                parts = re.split(r"\t+|\s{2,}", tail)
-                if parts:
-                    fecha_imp = parts[0].strip()
-                if len(parts) > 1:
-                    notif = parts[1].strip()
-                if len(parts) > 2:
-                    placa = parts[2].strip()
+                fecha_imp, notif, placa = _simit_fecha_fields(li)
                 break
             j += 1
 
@@ -345,12 +352,112 @@ PARSERS = {
     "Santa Marta": parse_santamarta,
 }
 
+# Plataformas cuyos registros traen fecha_notificacion (las que pueden alimentar 'Modificados')
+NOTIF_PLATFORMS = ["SIMIT", "FENIX", "Magdalena", "Soledad", "Bolívar"]
+
 def parse_platform(name: str, text: str) -> List[Record]:
     fn = PARSERS.get(name)
     if not fn:
         return []
     return fn(text or "")
 
+def parse_platform_with_extras(name: str, text: str) -> Tuple[List[Record], List[Dict[str, Any]]]:
+    """(registros, cobros coactivos). Solo SIMIT trae coactivos (ambos en una pasada); el resto devuelve lista vacía."""
+    if name == "SIMIT":
+        return parse_simit_full(text or "")
+    return parse_platform(name, text), []
+
+# --------------------------------------------------------------------
+# Parseo de varias plataformas (serial / hilos / procesos)
+# --------------------------------------------------------------------
+PARSE_MODES = ("auto", "serial", "thread", "process")
+# En "auto": por debajo (texto total) se parsea en serie; desde aquí, en procesos. Los hilos no se eligen
+# solos: los parsers son Python puro y el GIL los serializa.
+PROCESS_MIN_CHARS = 2_000_000
+
+def _process_context():
+    """
+    Los procesos salen de un servidor limpio (forkserver) donde exista: hacer fork del proceso que
+    llama (p. ej. el servidor de Streamlit, con sus hilos) puede dejar locks tomados en el hijo.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+# Un ejecutor por (modo, trabajadores), creado al primer uso y reutilizado: en la app cada cambio de
+# texto vuelve a parsear, y arrancar procesos en cada llamada costaría más que el parseo mismo.
+_POOLS: Dict[Tuple[str, int], Executor] = {}
+_POOLS_LOCK = threading.Lock()
+
+def _get_pool(mode: str, workers: int) -> Executor:
+    with _POOLS_LOCK:
+        pool = _POOLS.get((mode, workers))
+        if pool is None:
+            if mode == "process":
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=_process_context())
+            else:
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parse")
+            _POOLS[(mode, workers)] = pool
+        return pool
+
+def _drop_pool(mode: str, workers: int) -> None:
+    with _POOLS_LOCK:
+        pool = _POOLS.pop((mode, workers), None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+@atexit.register
+def shutdown_pools() -> None:
+    """Cierra los ejecutores reutilizados (al salir del intérprete o a mano, p. ej. en pruebas)."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def parse_many(
+    texts: Dict[str, str],
+    mode: str = "auto",
+    max_workers: Optional[int] = None,
+) -> Dict[str, Tuple[List[Record], List[Dict[str, Any]]]]:
+    """
+    Parsea {plataforma: texto} y devuelve {plataforma: (registros, coactivos)} en el MISMO orden de 'texts'.
+    - mode="serial": uno tras otro.
+    - mode="thread": ThreadPoolExecutor (solo si se pide: con el GIL casi no gana).
+    - mode="process": ProcessPoolExecutor (los parsers son puros y CPU-bound; ver _process_context).
+    - mode="auto": serie si el texto total es < PROCESS_MIN_CHARS o hay un solo núcleo; si no, procesos.
+    Con menos de 2 textos no vacíos siempre es serie. Los ejecutores se reutilizan entre llamadas (_get_pool).
+    """
+    if mode not in PARSE_MODES:
+        raise ValueError(f"Modo de parseo desconocido: {mode}")
+    names = list(texts.keys())
+    sizes = {n: len(texts[n] or "") for n in names}
+    total = sum(sizes.values())
+    busy = [n for n in names if sizes[n]]
+
+    if mode == "auto":
+        mode = "serial" if total < PROCESS_MIN_CHARS or (os.cpu_count() or 1) < 2 else "process"
+    if len(busy) < 2:
+        mode = "serial"
+
+    if mode == "serial":
+        return {n: parse_platform_with_extras(n, texts[n]) for n in names}
+
+    workers = max_workers or os.cpu_count() or 1
+
+    def run(pool: Executor) -> Dict[str, Tuple[List[Record], List[Dict[str, Any]]]]:
+        # Los más grandes primero para balancear la carga
+        futures = {n: pool.submit(parse_platform_with_extras, n, texts[n])
+                   for n in sorted(busy, key=lambda x: -sizes[x])}
+        return {n: futures[n].result() if n in futures else parse_platform_with_extras(n, texts[n])
+                for n in names}
+
+    try:
+        return run(_get_pool(mode, workers))
+    except BrokenProcessPool:
+        # Un proceso hijo murió (p. ej. sin memoria): se descarta el ejecutor y se reintenta una vez
+        _drop_pool(mode, workers)
+        return run(_get_pool(mode, workers))
+
 
 
 
@@ -364,22 +471,12 @@ from typing import List, Dict, Any
 _PLATE_INLINE_RE = re.compile(r"([A-Za-z]{3}\d{3}|[A-Za-z]{3}\d{2}[A-Za-z]|[A-Za-z]{2}\d{3}[A-Za-z])")
 _MONEY_RE = re.compile(r"\$\s*([\d\.\,]+)")
 _ALNUM_CODE_RE = re.compile(r"\b([A-Z]\d{1,2})\b", re.IGNORECASE)  # C29, C02, etc.
+_COACTIVO_NUM_RE = re.compile(r"\d{7,10}")  # número corto de coactivo (línea completa)
+_COACTIVO_WINDOW = 20  # líneas que abarca un bloque coactivo (incluida la del número)
 
 def _to_iso_date_cc(s: str) -> str:
-    s = str(s).strip()
-    # dd/mm/yyyy
-    for fmt in ("%d/%m/%Y", "%d/%m/%y"):
-        try:
-            from datetime import datetime
-            return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
-        except Exception:
-            pass
-    # intentar parseo automático de pandas
-    try:
-        import pandas as pd
-        return pd.to_datetime(s, errors="raise").strftime("%Y-%m-%d")
-    except Exception:
-        return s
+    # dd/mm/yyyy, dd/mm/yy o parseo automático de pandas; si no es fecha, el literal
+    return to_iso_loose_or_keep(str(s))
 
 def _first_money_in(s: str) -> str:
     m = _MONEY_RE.search(s or "")
@@ -392,6 +489,78 @@ def _first_money_in(s: str) -> str:
 def _line_has_multa(s: str) -> bool:
     return "multa" in (s or "").lower()
 
+def _new_coactivo(numero_coactivo: str) -> Dict[str, Any]:
+    return {
+        "numero_coactivo": numero_coactivo,
+        "fecha_resolucion": "",
+        "placa": "",
+        "organismo": "",
+        "codigo_infraccion": "",
+        "estado": "",
+        "valor": "",
+        "interes": "",
+        "valor_total": "",
+        "plataforma": "SIMIT",
+    }
+
+def _feed_coactivo_line(co: Dict[str, Any], li: str) -> None:
+    """Aplica una línea de la ventana del bloque coactivo sobre el registro 'co' (lo modifica)."""
+    # Fecha resolución + placa + organismo en la misma línea (separado por tabs o 2+ espacios)
+    if li.lower().startswith("fecha resolución:") or li.lower().startswith("fecha resolucion:"):
+        tail = li.split(":", 1)[1].strip() if ":" in li else ""
+        parts = re.split(r"\t+|\s{2,}", tail)
+        # fecha (primera parte)
+        if parts:
+            co["fecha_resolucion"] = _to_iso_date_cc(parts[0].strip())
+        # buscar placa en las partes y organismo en la última parte textual
+        for p in parts[1:]:
+            p = p.strip()
+            mpla = _PLATE_INLINE_RE.search(p.replace(" ", "").upper())
+            if mpla and not co["placa"]:
+                co["placa"] = mpla.group(1).upper()
+        # organismo: última parte que no sea 'No aplica' ni placa
+        placa = co["placa"]
+        for p in reversed(parts[1:]):
+            p = p.strip()
+            if p.lower() == "no aplica":
+                continue
+            if placa and p.replace(" ", "").upper() == placa:
+                continue
+            if p:
+                co["organismo"] = p
+                break
+
+    # Código infracción posible (C29, C02, etc.)
+    if not co["codigo_infraccion"]:
+        mcode = _ALNUM_CODE_RE.search(li)
+        if mcode:
+            co["codigo_infraccion"] = mcode.group(1).upper()
+
+    # Estado y valor (ej: "Pendiente de pago\t$ 603.939")
+    if not co["estado"] and ("pendiente" in li.lower() or "pago" in li.lower()):
+        # tomamos lo que está antes del primer tab / o 2+ espacios como estado
+        parts = re.split(r"\t+|\s{2,}", li)
+        if parts:
+            co["estado"] = parts[0].strip()
+        # y un primer $ como valor
+        v = _first_money_in(li)
+        if v:
+            co["valor"] = v
+
+    # Interés
+    if "interes" in li.lower() or "interés" in li.lower():
+        inter = _first_money_in(li)
+        if inter:
+            co["interes"] = inter
+
+    # Valor total: preferimos un renglón que sea solo el monto grande
+    if not co["valor_total"]:
+        m = _MONEY_RE.search(li)
+        if m:
+            # si la línea parece ser solo el monto o termina en monto, lo tomamos como total
+            if re.fullmatch(r"\$?\s*[\d\.\,]+\s*", li) or li.strip().endswith(m.group(0)):
+                co["valor_total"] = f"$ {m.group(1).replace(' ', '')}"
+
 def parse_simit_coactivos(text: str) -> List[Dict[str, Any]]:
     """
     Detecta bloques de 'Cobro Coactivo' dentro del texto de SIMIT.
@@ -413,98 +582,23 @@ def parse_simit_coactivos(text: str) -> List[Dict[str, Any]]:
     while i < n:
         line = lines[i]
         # Número corto (7-10 dígitos) para coactivo
-        if re.fullmatch(r"\d{7,10}", line or ""):
+        if _COACTIVO_NUM_RE.fullmatch(line or ""):
             # ¿Hay 'Multa' cerca?
             has_multa = any(_line_has_multa(lines[k]) for k in range(i + 1, min(i + 4, n)))
             if not has_multa:
                 i += 1
                 continue
 
-            numero_coactivo = line
-            fecha_resolucion = ""
-            placa = ""
-            organismo = ""
-            codigo_infraccion = ""
-            estado = ""
-            valor = ""
-            interes = ""
-            valor_total = ""
+            co = _new_coactivo(line)
 
             # Escanear un bloque limitado de líneas (ventana acotada)
-            j_end = min(i + 20, n)
+            j_end = min(i + _COACTIVO_WINDOW, n)
             j = i + 1
             while j < j_end:
-                li = lines[j]
-
-                # Fecha resolución + placa + organismo en la misma línea (separado por tabs o 2+ espacios)
-                if li.lower().startswith("fecha resolución:") or li.lower().startswith("fecha resolucion:"):
-                    tail = li.split(":", 1)[1].strip() if ":" in li else ""
-                    parts = re.split(r"\t+|\s{2,}", tail)
-                    # fecha (primera parte)
-                    if parts:
-                        fecha_resolucion = _to_iso_date_cc(parts[0].strip())
-                    # buscar placa en las partes y organismo en la última parte textual
-                    for p in parts[1:]:
-                        p = p.strip()
-                        mpla = _PLATE_INLINE_RE.search(p.replace(" ", "").upper())
-                        if mpla and not placa:
-                            placa = mpla.group(1).upper()
-                    # organismo: última parte que no sea 'No aplica' ni placa
-                    for p in reversed(parts[1:]):
-                        p = p.strip()
-                        if p.lower() == "no aplica":
-                            continue
-                        if placa and p.replace(" ", "").upper() == placa:
-                            continue
-                        if p:
-                            organismo = p
-                            break
-
-                # Código infracción posible (C29, C02, etc.)
-                if not codigo_infraccion:
-                    mcode = _ALNUM_CODE_RE.search(li)
-                    if mcode:
-                        codigo_infraccion = mcode.group(1).upper()
-
-                # Estado y valor (ej: "Pendiente de pago\t$ 603.939")
-                if not estado and ("pendiente" in li.lower() or "pago" in li.lower()):
-                    # tomamos lo que está antes del primer tab / o 2+ espacios como estado
-                    parts = re.split(r"\t+|\s{2,}", li)
-                    if parts:
-                        estado = parts[0].strip()
-                    # y un primer $ como valor
-                    v = _first_money_in(li)
-                    if v:
-                        valor = v
-
-                # Interés
-                if "interes" in li.lower() or "interés" in li.lower():
-                    inter = _first_money_in(li)
-                    if inter:
-                        interes = inter
-
-                # Valor total: preferimos un renglón que sea solo el monto grande
-                if not valor_total:
-                    m = _MONEY_RE.search(li)
-                    if m:
-                        # si la línea parece ser solo el monto o termina en monto, lo tomamos como total
-                        if re.fullmatch(r"\$?\s*[\d\.\,]+\s*", li) or li.strip().endswith(m.group(0)):
-                            valor_total = f"$ {m.group(1).replace(' ', '')}"
-
+                _feed_coactivo_line(co, lines[j])
                 j += 1
 
-            out.append({
-                "numero_coactivo": numero_coactivo,
-                "fecha_resolucion": fecha_resolucion,
-                "placa": placa,
-                "organismo": organismo,
-                "codigo_infraccion": codigo_infraccion,
-                "estado": estado,
-                "valor": valor,
-                "interes": interes,
-                "valor_total": valor_total,
-                "plataforma": "SIMIT",
-            })
+            out.append(co)
 
             # Avanzar al final del bloque escaneado
             i = j
@@ -513,3 +607,78 @@ def parse_simit_coactivos(text: str) -> List[Dict[str, Any]]:
         i += 1
 
     return out
+
+# ===== SIMIT en una sola pasada (comparendos + cobros coactivos) =====
+def parse_simit_full(text: str) -> Tuple[List[Record], List[Dict[str, Any]]]:
+    """
+    Equivale a (parse_simit(text), parse_simit_coactivos(text)) pero en UN solo recorrido lineal:
+    cada línea se limpia una vez y alimenta dos máquinas de estado.
+      - Comparendos: BUSCAR número -> ESPERAR 'Fecha imposición:'. La línea de fecha se vuelve
+        a evaluar como posible número (igual que parse_simit). Sin fecha, el registro se cierra al final.
+      - Coactivos: un número de 7-10 dígitos queda PENDIENTE hasta ver 'Multa' en sus 3 líneas
+        siguientes (se guardan en un buffer de a lo sumo 3 líneas); al confirmarse abre una ventana
+        de 20 líneas. Nunca se vuelve a recorrer el texto.
+    """
+    records: List[Record] = []
+    coactivos: List[Dict[str, Any]] = []
+    if not text:
+        return records, coactivos
+
+    # Estado comparendos
+    numero = ""            # número en espera de su línea 'Fecha imposición:'
+    # Estado coactivos
+    block: Optional[Dict[str, Any]] = None   # bloque confirmado en curso
+    block_end = 0                            # índice (exclusivo) donde termina la ventana del bloque
+    pending: List[int] = []                  # candidatos (índices) esperando 'Multa'
+    buffer: List[str] = []                   # líneas desde el primer candidato pendiente (<= 3 + 1)
+    buffer_start = 0                         # índice de buffer[0]
+
+    for k, raw in enumerate(text.splitlines()):
+        line = raw.strip()
+
+        # ---- Comparendos ----
+        if numero and (line.startswith("Fecha imposición:") or line.startswith("Fecha imposicion:")):
+            fecha_imp, notif, placa = _simit_fecha_fields(line)
+            records.append(ensure_record(numero, fecha_imp, notif, placa, "SIMIT"))
+            numero = ""
+        if not numero:
+            numero = _extract_inline_token_with_min_digits(line, min_digits=11)
+
+        # ---- Coactivos ----
+        if block is not None:
+            if k < block_end:
+                _feed_coactivo_line(block, line)
+                continue
+            coactivos.append(block)
+            block = None
+
+        if pending:
+            buffer.append(line)
+            if _line_has_multa(line):
+                # Gana el candidato pendiente más antiguo (los demás caen dentro de su ventana)
+                c = pending[0]
+                block = _new_coactivo(buffer[c - buffer_start])
+                block_end = c + _COACTIVO_WINDOW
+                for li in buffer[c - buffer_start + 1:]:
+                    _feed_coactivo_line(block, li)
+                pending, buffer = [], []
+                continue
+            # Candidatos cuya ventana de 3 líneas ya pasó sin 'Multa' se descartan
+            while pending and k - pending[0] >= 3:
+                pending.pop(0)
+            if pending:
+                buffer = buffer[pending[0] - buffer_start:]
+                buffer_start = pending[0]
+            else:
+                buffer = []
+
+        if _COACTIVO_NUM_RE.fullmatch(line):
+            if not pending:
+                buffer, buffer_start = [line], k
+            pending.append(k)
+
+    if numero:
+        records.append(ensure_record(numero, "", "", "", "SIMIT"))
+    if block is not None:
+        coactivos.append(block)
+    return records, coactivos
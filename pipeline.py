@@ -0,0 +1,386 @@
+# pipeline.py
+"""
+Orquestación del proceso diario SIN Streamlit: parseo -> backfill -> conteo ->
+tres tablas -> Modificados. La usan app.run_all (estado en st.session_state)
+y batch.py (línea de comandos); ambos pasan un dict de estado con las mismas claves.
+"""
+from __future__ import annotations
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from parsers import parse_many, parse_platform_with_extras, PARSERS, PARSER_VERSION, NOTIF_PLATFORMS
+from aggregator import IncrementalAggregate, PlatformBits, render_platforms
+from comparator import build_three_tables
+from backfill import split_backfill_rows
+from modificados import build_modificados_table, build_modificados_multi
+from profiling import StageProfiler
+from snapshot_store import DEFAULT_KEEP_DAYS, SnapshotStore
+from history import History
+from deadlines import DeadlineQueue
+
+PLATFORMS = list(PARSERS.keys())
+RAW_COLS = ["numero_comparendo", "fecha_imposicion", "fecha_notificacion", "placa", "plataforma"]
+COACTIVOS_COLS = ["numero_coactivo","fecha_resolucion","placa","organismo","codigo_infraccion","estado","valor","interes","valor_total","plataforma"]
+
+Message = Tuple[str, str]  # (nivel: "success" | "warning" | "error", texto)
+
+# -------------------- Estado --------------------
+def new_state() -> Dict[str, Any]:
+    """Estado inicial del proceso (mismas claves que st.session_state[APP_KEY] en app.py)."""
+    return {
+        "inputs": {p: "" for p in PLATFORMS},
+        "rows_by_platform": {p: [] for p in PLATFORMS},
+        "platform_down": {p: False for p in PLATFORMS},
+        "yesterday_summary_df": None,
+        "yesterday_summary_digest": "",
+        "yesterday_any_df": None,
+        "yesterday_index": None,  # YesterdayIndex del Excel de comparativa (se construye al cargarlo)
+        "yesterday_any_digest": "",
+        "yesterday_source": "",  # de dónde salió AYER: "" (Excel subido) o "histórico YYYY-MM-DD"
+        "yesterday_summary_source": "",  # ídem para el Resumen de AYER
+        "df_raw": pd.DataFrame(),  # caché de raw_frame(); None = por armar
+        "df_today": pd.DataFrame(),  # Conteo con máscara de plataformas (texto: conteo_frame)
+        "three_tables": None,
+        "df_modificados": pd.DataFrame(),
+        "modificados_all": False,  # True: Modificados de todas las NOTIF_PLATFORMS (con columna 'plataforma')
+        "coactivos_simit": [],  # estado para cobros coactivos
+        "parse_cache": {},  # plataforma -> {"digest", "rows", "coactivos"} del último parseo
+        "stage_fingerprints": {},  # etapa -> huella de sus entradas (para omitir etapas sin cambios)
+        "snapshot_fingerprint": "",  # huellas de etapa del último día guardado en el histórico
+        "aggregate_inc": None,  # IncrementalAggregate con el aporte de cada plataforma al Conteo
+        "aggregate_inputs": {},  # plataforma -> huella de las filas ya aplicadas en aggregate_inc
+        "raw_frames": {},  # plataforma -> DataFrame de sus filas crudas (df_raw = concatenación)
+        "deadlines": DeadlineQueue(),  # vencimientos de descuento de todo el Conteo notificado
+        "stage_seconds": {},  # etapa -> segundos de la última corrida
+        "profile": None,  # StageProfiler de la última corrida (solo si se pidió medición detallada)
+    }
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _parse_digest(platform: str, text: str) -> str:
+    """Huella del texto pegado + versión de parsers: si no cambia, el parseo anterior sigue siendo válido."""
+    h = hashlib.sha256()
+    for part in (PARSER_VERSION, platform, text or ""):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def _stage_digest(*parts: Any) -> str:
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+def concat_rows(rows_by_platform: Dict[str, List[Dict[str, Any]]]) -> pd.DataFrame:
+    data: List[Dict[str, Any]] = []
+    for p in PLATFORMS:
+        data.extend(rows_by_platform.get(p, []))
+    if not data:
+        return pd.DataFrame(columns=RAW_COLS)
+    df = pd.DataFrame(data)
+    for c in RAW_COLS:
+        if c not in df.columns:
+            df[c] = ""
+    return df[RAW_COLS]
+
+# -------------------- Proceso unificado --------------------
+def run_pipeline(state: Dict[str, Any], parse_mode: str = "auto", profiler: Optional[StageProfiler] = None) -> List[Message]:
+    """
+    Ejecuta todas las etapas sobre 'state' (lo modifica) y devuelve los mensajes para el usuario.
+    Las etapas cuyas entradas no cambiaron desde la corrida anterior se omiten.
+    'profiler' activo: además mide CPU/filas/memoria por etapa y por plataforma (el parseo corre en serie
+    para que cada tiempo sea atribuible); queda en state["profile"].
+    """
+    prof = profiler or StageProfiler()
+    prof.start()
+    try:
+        messages = _run_stages(state, parse_mode, prof)
+    finally:
+        prof.stop()
+    state["stage_seconds"] = prof.seconds()
+    state["profile"] = prof if prof.enabled else None
+    return messages
+
+def _run_stages(state: Dict[str, Any], parse_mode: str, prof: StageProfiler) -> List[Message]:
+    messages: List[Message] = []
+    parse_cache = state["parse_cache"]
+    fps = state["stage_fingerprints"]
+
+    # 1) Parseo HOY (texto pegado); solo se re-parsean las plataformas cuyo texto cambió
+    with prof.stage("parse") as rec:
+        source_fp: Dict[str, str] = {}
+        dirty: Dict[str, str] = {}
+        for name in PLATFORMS:
+            text = state["inputs"][name]
+            digest = _parse_digest(name, text)
+            cached = parse_cache.get(name)
+            if cached is None or cached["digest"] != digest:
+                dirty[name] = text
+            source_fp[name] = digest
+        if dirty and prof.enabled:
+            parsed = {}
+            for name, text in dirty.items():
+                with prof.stage(f"parse:{name}", rows_in=text.count("\n") + 1 if text else 0) as prec:
+                    parsed[name] = parse_platform_with_extras(name, text)
+                    prec["filas_salida"] = len(parsed[name][0])
+        elif dirty:
+            parsed = parse_many(dirty, mode=parse_mode)
+        else:
+            parsed = {}
+        for name, (rows, coactivos) in parsed.items():
+            parse_cache[name] = {"digest": source_fp[name], "rows": rows, "coactivos": coactivos}
+        for name in PLATFORMS:
+            state["rows_by_platform"][name] = parse_cache[name]["rows"]
+        state["coactivos_simit"] = parse_cache["SIMIT"]["coactivos"] if "SIMIT" in parse_cache else []
+        rec["filas_salida"] = sum(len(r) for r in state["rows_by_platform"].values())
+
+    # 2) Backfill si marcaste caídas y cargaste Resumen AYER (hoja 1)
+    with prof.stage("backfill") as rec:
+        df_prev = state["yesterday_summary_df"]
+        replaced = []
+        n_backfill = 0
+        if df_prev is not None and not getattr(df_prev, "empty", False):
+            rec["filas_entrada"] = len(df_prev)
+            down = [p for p, is_down in state["platform_down"].items() if is_down]
+            for p, backfill_rows in split_backfill_rows(df_prev, down).items():
+                if backfill_rows:
+                    state["rows_by_platform"][p] = backfill_rows
+                    source_fp[p] = "backfill:" + state["yesterday_summary_digest"]
+                    replaced.append(p)
+                    n_backfill += len(backfill_rows)
+        rec["filas_salida"] = n_backfill
+        if replaced:
+            messages.append(("success", "Backfill: " + ", ".join(replaced)))
+        elif any(state["platform_down"].values()) and (df_prev is None or getattr(df_prev, "empty", False)):
+            messages.append(("warning", "Marcaste caídas, pero no subiste el Resumen de AYER."))
+
+    # 3) Crudo + Conteo: solo se recalculan las claves de las plataformas que cambiaron
+    with prof.stage("aggregate") as rec:
+        agg_fp = _stage_digest([source_fp[p] for p in PLATFORMS])
+        prev_agg_fp = fps.get("aggregate")
+        if fps.get("aggregate") != agg_fp:
+            inc = state["aggregate_inc"]
+            applied = state["aggregate_inputs"]
+            if inc is None or inc.platform_order != PLATFORMS:
+                inc = state["aggregate_inc"] = IncrementalAggregate(PLATFORMS)
+                applied.clear()
+                state["raw_frames"] = {}
+            changed = {p: concat_rows({p: state["rows_by_platform"][p]})
+                       for p in PLATFORMS if applied.get(p) != source_fp[p]}
+            inc.replace_sources(changed)
+            for p, frame in changed.items():
+                state["raw_frames"][p] = frame
+                applied[p] = source_fp[p]
+            state["df_raw"] = None  # se arma al pedirlo (raw_frame)
+            state["df_today"] = inc.to_frame()
+            fps["aggregate"] = agg_fp
+            rec["filas_entrada"] = sum(len(f) for f in changed.values())
+        df_today = state["df_today"]
+        rec["filas_salida"] = len(df_today)
+
+    # 3.1) Vencimientos 50% / 25% de todo lo notificado: solo se tocan las claves que cambiaron
+    with prof.stage("deadlines", rows_in=len(df_today)) as rec:
+        if fps.get("deadlines") != agg_fp:
+            inc = state["aggregate_inc"]
+            keys = inc.last_changed if inc is not None else None
+            if keys is not None and prev_agg_fp is not None and fps.get("deadlines") == prev_agg_fp:
+                # La cola iba al día con el Conteo anterior: basta con las filas de las claves recalculadas
+                rec["filas_entrada"] = len(keys)
+                state["deadlines"].apply_changes(render_platforms(inc.rows_of(keys), inc.bits), keys.tolist())
+            else:
+                state["deadlines"].apply_conteo(conteo_frame(state))
+            fps["deadlines"] = agg_fp
+        rec["filas_salida"] = len(state["deadlines"])
+
+    # 4) Tres tablas (comparativa) si hay Excel AYER cargado
+    with prof.stage("three_tables", rows_in=len(df_today)) as rec:
+        df_y_any = state["yesterday_any_df"]
+        y_index = state["yesterday_index"]
+        has_yesterday = y_index is not None or (df_y_any is not None and not getattr(df_y_any, "empty", False))
+        df_prev_summary = state["yesterday_summary_df"]
+        counts = {"nuevos": 0, "mantenidos": 0, "eliminados": 0}
+        three_fp = _stage_digest(agg_fp, state["yesterday_any_digest"], state["yesterday_summary_digest"])
+        if has_yesterday and not df_today.empty:
+            if fps.get("three_tables") != three_fp:
+                try:
+                    res = build_three_tables(df_today, df_y_any, df_prev_summary=df_prev_summary,
+                                             yesterday_index=y_index, platform_bits=state["aggregate_inc"].bits)
+                except Exception as e:
+                    state["three_tables"] = None
+                    state["counts"] = counts
+                    fps.pop("three_tables", None)
+                    messages.append(("error", f"No fue posible generar comparativa: {e}"))
+                else:
+                    state["three_tables"] = res
+                    counts = {
+                        "nuevos": len(res["NUEVOS"]),
+                        "mantenidos": len(res["MANTENIDOS"]),
+                        "eliminados": len(res["ELIMINADOS"]),
+                    }
+                    state["counts"] = counts
+                    fps["three_tables"] = three_fp
+        else:
+            state["three_tables"] = None
+            state["counts"] = counts
+            fps.pop("three_tables", None)
+        rec["filas_salida"] = sum(state.get("counts", counts).values())
+
+    # 5) Modificados (SIMIT, o todas las plataformas con notificación, vs Excel AYER)
+    mod_all = bool(state.get("modificados_all", False))
+    mod_platforms = NOTIF_PLATFORMS if mod_all else ["SIMIT"]
+    rows_mod = {p: state["rows_by_platform"].get(p, []) for p in mod_platforms}
+    n_mod = sum(len(r) for r in rows_mod.values())
+    with prof.stage("modificados", rows_in=n_mod) as rec:
+        mod_fp = _stage_digest([source_fp.get(p, "") for p in mod_platforms], state["yesterday_any_digest"])
+        if has_yesterday and n_mod:
+            if fps.get("modificados") != mod_fp:
+                try:
+                    if mod_all:
+                        df_mod = build_modificados_multi(rows_mod, df_y_any, yesterday_index=y_index)
+                    else:
+                        df_mod = build_modificados_table(rows_mod["SIMIT"], df_y_any, yesterday_index=y_index)
+                except Exception as e:
+                    state["df_modificados"] = pd.DataFrame()
+                    fps.pop("modificados", None)
+                    messages.append(("error", f"No fue posible generar 'Modificados': {e}"))
+                else:
+                    state["df_modificados"] = df_mod
+                    fps["modificados"] = mod_fp
+        else:
+            state["df_modificados"] = pd.DataFrame()
+            fps.pop("modificados", None)
+        rec["filas_salida"] = len(state["df_modificados"])
+
+    return messages
+
+def raw_frame(state: Dict[str, Any]) -> pd.DataFrame:
+    """Crudo de todas las plataformas (hoja Resumen): se concatena solo cuando alguien lo pide y queda en caché."""
+    if state["df_raw"] is None:
+        frames = [state["raw_frames"][p] for p in PLATFORMS
+                  if p in state["raw_frames"] and not state["raw_frames"][p].empty]
+        state["df_raw"] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=RAW_COLS)
+    return state["df_raw"]
+
+def conteo_frame(state: Dict[str, Any]) -> pd.DataFrame:
+    """Conteo para mostrar/exportar: la máscara de plataformas pasa a texto 'SIMIT-FENIX-...'."""
+    inc = state.get("aggregate_inc")
+    return render_platforms(state["df_today"], inc.bits if inc is not None else PlatformBits(PLATFORMS))
+
+# -------------------- Histórico local --------------------
+def use_snapshot_as_yesterday(state: Dict[str, Any], store: SnapshotStore, today: str,
+                              comparison: bool = True, summary: bool = True) -> Optional[str]:
+    """
+    Toma como AYER el último día guardado antes de 'today' (YYYY-MM-DD): su Conteo reemplaza al
+    Excel de comparativa y su Resumen crudo al 'Resumen de AYER'. Devuelve el día usado o None.
+    """
+    day = store.previous_day(today)
+    if not day or not (comparison or summary):
+        return None
+    digest = f"snapshot:{store.path}:{day}:{store.saved_at(day)}"
+    if (not comparison or state["yesterday_any_digest"] == digest) and \
+            (not summary or state["yesterday_summary_digest"] == digest):
+        return day  # ya cargado (los reruns de la app no vuelven a leer la base)
+    df_summary, y_index = store.load_yesterday(day)
+    if comparison:
+        state["yesterday_any_df"] = None
+        state["yesterday_index"] = y_index
+        state["yesterday_any_digest"] = digest
+        state["yesterday_source"] = f"histórico {day}"
+    if summary:
+        state["yesterday_summary_df"] = df_summary
+        state["yesterday_summary_digest"] = digest
+        state["yesterday_summary_source"] = f"histórico {day}"
+    return day
+
+def snapshot_notice(state: Dict[str, Any], today: str) -> Optional[Message]:
+    """
+    Aviso de qué parte de AYER (comparativa / Resumen) sale del histórico local y de qué día, para que
+    nunca se compare contra un día guardado sin saberlo. None si todo viene de archivos subidos.
+    Es advertencia cuando se mezcla: comparativa subida con Resumen del histórico, o al revés.
+    """
+    comp, summ = state["yesterday_source"], state["yesterday_summary_source"]
+    if not comp and not summ:
+        return None
+    day = (comp or summ).split()[-1]
+    age = (datetime.fromisoformat(today) - datetime.fromisoformat(day)).days
+    when = f"del {day} (hace {age} día{'s' if age != 1 else ''})"
+    if comp and summ:
+        return "info", f"Comparativa y Resumen de AYER tomados del histórico {when}."
+    if summ:
+        return "warning", (f"Resumen de AYER tomado del histórico {when} (no hay Resumen subido). "
+                           "Las plataformas caídas se completan con ese día.")
+    return "warning", f"Comparativa contra el histórico {when} (no hay Excel de comparativa subido)."
+
+def missing_platforms(state: Dict[str, Any]) -> List[str]:
+    """Plataformas sin texto pegado y sin marcar como caídas: con alguna, la corrida está incompleta."""
+    return [p for p in PLATFORMS
+            if not (state["inputs"].get(p) or "").strip() and not state["platform_down"].get(p)]
+
+def save_snapshot(state: Dict[str, Any], store: SnapshotStore, day: str,
+                  keep_days: int = DEFAULT_KEEP_DAYS, allow_partial: bool = False) -> bool:
+    """
+    Guarda el resultado procesado de 'day' (reemplaza lo que hubiera de ese día): ese día será el AYER
+    de mañana, así que una corrida incompleta (missing_platforms) da ValueError salvo con allow_partial.
+    Si nada cambió desde el último guardado (mismas huellas de etapa) no escribe y devuelve False.
+    Después conserva solo los 'keep_days' días más recientes (SnapshotStore.prune; 0 = todos).
+    """
+    missing = missing_platforms(state)
+    if missing and not allow_partial:
+        raise ValueError("corrida incompleta, faltan: " + ", ".join(missing))
+    fp = _stage_digest(store.path, day, sorted(state["stage_fingerprints"].items()))
+    if state.get("snapshot_fingerprint") == fp:
+        return False
+    store.save_day(day, raw_frame(state), conteo_frame(state), state["coactivos_simit"], state["df_modificados"])
+    state["snapshot_fingerprint"] = fp
+    # El conteo contra el día anterior queda calculado de una vez para las tendencias (history.py)
+    prev = store.previous_day(day)
+    if prev:
+        History(store).transition(prev, day)
+    store.prune(keep_days)
+    return True
+
+# -------------------- Reporte --------------------
+def report_sheets(state: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, pd.DataFrame]:
+    """Hojas del reporte completo (Resumen, Conteo, Nuevos, Mantenidos, Eliminados, Modificados, Cobros coactivos)."""
+    now = now or datetime.now()
+    df_raw = raw_frame(state)
+    df_today = conteo_frame(state)
+    three = state["three_tables"]
+    df_mod = state["df_modificados"]
+
+    sheets: Dict[str, pd.DataFrame] = {}
+
+    if not df_raw.empty:
+        resumen_name = f"Resumen {now.strftime('%d-%m-%y')}"
+        sheets[resumen_name] = df_raw
+
+    if not df_today.empty:
+        sheets["Conteo"] = df_today
+
+    if isinstance(three, dict):
+        if "NUEVOS" in three and not three["NUEVOS"].empty:
+            sheets["Nuevos"] = three["NUEVOS"]
+        if "MANTENIDOS" in three and not three["MANTENIDOS"].empty:
+            sheets["Mantenidos"] = three["MANTENIDOS"]
+        if "ELIMINADOS" in three and not three["ELIMINADOS"].empty:
+            sheets["Eliminados"] = three["ELIMINADOS"]
+
+    if isinstance(df_mod, pd.DataFrame) and not df_mod.empty:
+        sheets["Modificados"] = df_mod
+
+    # Agregar cobros coactivos al Excel si existen
+    coact_list = state.get("coactivos_simit", [])
+    if coact_list:
+        df_coact = pd.DataFrame(coact_list, columns=COACTIVOS_COLS)
+        if not df_coact.empty:
+            sheets["Cobros coactivos"] = df_coact
+
+    # Tiempos por etapa de la última corrida medida; el mismo bloque JSON de la descarga va en su
+    # propia hoja, una línea por fila (ninguna celda se acerca al límite de 32767 caracteres de Excel)
+    prof = state.get("profile")
+    if prof is not None and prof.records:
+        sheets["Tiempos"] = prof.to_frame()
+        sheets["Tiempos JSON"] = pd.DataFrame({"json": prof.to_json().splitlines()})
+
+    return sheets
@@ -0,0 +1,121 @@
+# profiling.py
+"""
+Medición por etapa del proceso (parseo por plataforma, backfill, conteo, tres tablas, Modificados).
+
+    prof = StageProfiler(enabled=True, trace_memory=True)
+    with prof.stage("conteo", rows_in=len(df_raw)) as rec:
+        df_today = aggregate_by_comparendo(df_raw, ...)
+        rec["filas_salida"] = len(df_today)
+
+Siempre se toma el tiempo de pared (un perf_counter por etapa). Con enabled=True se agregan
+tiempo de CPU, filas de entrada/salida y, si trace_memory=True, el pico de memoria (tracemalloc).
+Con use_cprofile=True se perfila toda la corrida con cProfile y se puede descargar el volcado.
+"""
+from __future__ import annotations
+import cProfile
+import io
+import json
+import marshal
+import pstats
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+TIMING_COLS = ["etapa", "wall_s", "cpu_s", "filas_entrada", "filas_salida", "pico_mem_mb"]
+
+class _Stage:
+    """Context manager de una etapa; el registro (dict) queda en profiler.records al salir."""
+    __slots__ = ("prof", "rec", "_t0", "_c0", "_mem0")
+
+    def __init__(self, prof: "StageProfiler", name: str, rows_in: Optional[int]):
+        self.prof = prof
+        self.rec: Dict[str, Any] = {"etapa": name, "filas_entrada": rows_in, "filas_salida": None}
+
+    def __enter__(self) -> Dict[str, Any]:
+        prof = self.prof
+        if prof.enabled:
+            if prof.trace_memory:
+                # El pico global se reinicia por etapa; antes se acumula en la etapa que nos contiene
+                cur, peak = tracemalloc.get_traced_memory()
+                if prof._stack:
+                    parent = prof._stack[-1]
+                    parent._mem0[1] = max(parent._mem0[1], peak)
+                tracemalloc.reset_peak()
+                self._mem0 = [cur, cur]  # [memoria al entrar, pico acumulado de etapas hijas]
+            prof._stack.append(self)
+            self._c0 = time.process_time()
+        self._t0 = time.perf_counter()
+        return self.rec
+
+    def __exit__(self, *exc) -> None:
+        rec = self.rec
+        rec["wall_s"] = time.perf_counter() - self._t0
+        prof = self.prof
+        if prof.enabled:
+            rec["cpu_s"] = time.process_time() - self._c0
+            prof._stack.pop()
+            if prof.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], self._mem0[1])
+                rec["pico_mem_mb"] = (peak - self._mem0[0]) / 2**20
+                if prof._stack:
+                    parent = prof._stack[-1]
+                    parent._mem0[1] = max(parent._mem0[1], peak)
+        prof.records.append(rec)
+
+class StageProfiler:
+    def __init__(self, enabled: bool = False, trace_memory: bool = False, use_cprofile: bool = False):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.use_cprofile = enabled and use_cprofile
+        self.records: List[Dict[str, Any]] = []
+        self._stack: List[_Stage] = []
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._started_tracemalloc = False
+
+    # ---- Corrida completa ----
+    def start(self) -> None:
+        """Abre la corrida (tracemalloc / cProfile si están activos)."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.use_cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self) -> None:
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def stage(self, name: str, rows_in: Optional[int] = None) -> _Stage:
+        return _Stage(self, name, rows_in)
+
+    # ---- Resultados ----
+    def seconds(self) -> Dict[str, float]:
+        """{etapa: segundos de pared} (solo etapas de primer nivel, sin las 'parse:<plataforma>')."""
+        return {r["etapa"]: r["wall_s"] for r in self.records if ":" not in r["etapa"]}
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.records, columns=TIMING_COLS)
+
+    def to_json(self) -> str:
+        return json.dumps(self.records, ensure_ascii=False, indent=2)
+
+    def cprofile_dump(self) -> bytes:
+        """Volcado en formato .prof (se abre con pstats.Stats(ruta) o snakeviz); b'' si no se perfiló."""
+        if self._cprofile is None:
+            return b""
+        self._cprofile.create_stats()
+        return marshal.dumps(self._cprofile.stats)
+
+    def cprofile_text(self, limit: int = 40) -> str:
+        """Top de funciones por tiempo acumulado, como texto."""
+        if self._cprofile is None:
+            return ""
+        buf = io.StringIO()
+        pstats.Stats(self._cprofile, stream=buf).sort_stats("cumulative").print_stats(limit)
+        return buf.getvalue()
@@ -0,0 +1,191 @@
+# snapshot_store.py
+"""
+Histórico local (SQLite) de cada día procesado: Resumen crudo, Conteo, cobros coactivos y Modificados.
+Cada fila lleva la clave canónica (solo dígitos) y la placa, ambas indexadas por día, así que
+"AYER" se carga con una consulta en vez de re-escanear un Excel.
+
+    store = SnapshotStore("comparendos_snapshots.sqlite")
+    store.save_day("2024-05-02", df_raw, df_today, coactivos, df_modificados)
+    day = store.previous_day("2024-05-03")            # '2024-05-02'
+    df_summary, y_index = store.load_yesterday(day)   # para build_three_tables / build_modificados_table
+"""
+from __future__ import annotations
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from yesterday_index import YesterdayIndex
+
+DEFAULT_DB_PATH = os.environ.get("COMPARENDOS_DB", "comparendos_snapshots.sqlite")
+# Días guardados que se conservan (los más recientes); 0 = todos
+DEFAULT_KEEP_DAYS = int(os.environ.get("COMPARENDOS_DB_KEEP_DAYS", "60"))
+
+RAW_COLS = ["numero_comparendo", "fecha_imposicion", "fecha_notificacion", "placa", "plataforma"]
+CONTEO_COLS = ["numero_comparendo", "fecha_imposicion", "fecha_notificacion", "placa", "plataformas", "numero_veces"]
+COACTIVOS_COLS = ["numero_coactivo", "fecha_resolucion", "placa", "organismo", "codigo_infraccion",
+                  "estado", "valor", "interes", "valor_total", "plataforma"]
+MODIFICADOS_COLS = ["numero_comparendo", "placa", "notif_ayer", "notif_hoy", "estado", "50_desc_hasta", "25_desc_hasta",
+                    "plataforma"]
+
+# tabla -> (columnas de datos, ¿lleva clave canónica?)
+TABLES: Dict[str, Tuple[List[str], bool]] = {
+    "raw": (RAW_COLS, True),
+    "conteo": (CONTEO_COLS, True),
+    "coactivos": (COACTIVOS_COLS, False),
+    "modificados": (MODIFICADOS_COLS, True),
+}
+
+def _q(col: str) -> str:
+    return '"' + col.replace('"', '""') + '"'
+
+def _schema() -> List[str]:
+    stmts = [
+        "CREATE TABLE IF NOT EXISTS snapshots (day TEXT PRIMARY KEY, saved_at TEXT NOT NULL)",
+    ]
+    for table, (cols, keyed) in TABLES.items():
+        extra = ", clave TEXT NOT NULL" if keyed else ""
+        data_cols = ", ".join(f"{_q(c)} {'INTEGER' if c == 'numero_veces' else 'TEXT'}" for c in cols)
+        stmts.append(f"CREATE TABLE IF NOT EXISTS {table} (day TEXT NOT NULL, orden INTEGER NOT NULL{extra}, {data_cols})")
+        stmts.append(f"CREATE INDEX IF NOT EXISTS ix_{table}_day ON {table} (day, orden)")
+        if keyed:
+            stmts.append(f"CREATE INDEX IF NOT EXISTS ix_{table}_clave ON {table} (clave, day)")
+        if "placa" in cols:
+            stmts.append(f"CREATE INDEX IF NOT EXISTS ix_{table}_placa ON {table} (placa, day)")
+    return stmts
+
+def _frame_for_table(table: str, day: str, df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    cols, keyed = TABLES[table]
+    df = df if isinstance(df, pd.DataFrame) else pd.DataFrame(columns=cols)
+    out = pd.DataFrame(index=range(len(df)))
+    out["day"] = day
+    out["orden"] = range(len(df))
+    for c in cols:
+        if c in df.columns:
+            s = df[c].reset_index(drop=True)
+            out[c] = s if c == "numero_veces" else s.fillna("").astype(str)
+        else:
+            out[c] = 0 if c == "numero_veces" else ""
+    if keyed:
+        out["clave"] = out["numero_comparendo"].str.replace(r"\D+", "", regex=True)
+    return out
+
+class SnapshotStore:
+    """Un archivo SQLite; cada save_day reemplaza por completo las filas de ese día."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        with closing(self._connect()) as con, con:
+            for stmt in _schema():
+                con.execute(stmt)
+            # Bases creadas con una versión anterior: agrega las columnas nuevas
+            for table, (cols, _) in TABLES.items():
+                have = {r[1] for r in con.execute(f"PRAGMA table_info({table})")}
+                for c in cols:
+                    if c not in have:
+                        con.execute(f"ALTER TABLE {table} ADD COLUMN {_q(c)} TEXT DEFAULT ''")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+    # ---- Escritura ----
+    def save_day(
+        self,
+        day: str,
+        df_raw: pd.DataFrame,
+        df_today: pd.DataFrame,
+        coactivos: Optional[List[Dict[str, Any]]] = None,
+        df_modificados: Optional[pd.DataFrame] = None,
+    ) -> None:
+        frames = {
+            "raw": df_raw,
+            "conteo": df_today,
+            "coactivos": pd.DataFrame(coactivos or [], columns=COACTIVOS_COLS),
+            "modificados": df_modificados,
+        }
+        with closing(self._connect()) as con, con:  # una transacción: el día queda completo o no queda
+            self._delete_day(con, day)
+            for table, df in frames.items():
+                _frame_for_table(table, day, df).to_sql(table, con, if_exists="append", index=False, chunksize=50_000)
+            con.execute("INSERT INTO snapshots (day, saved_at) VALUES (?, ?)",
+                        (day, datetime.now().isoformat(timespec="seconds")))
+
+    def delete_day(self, day: str) -> None:
+        with closing(self._connect()) as con, con:
+            self._delete_day(con, day)
+
+    def prune(self, keep_days: int = DEFAULT_KEEP_DAYS) -> List[str]:
+        """
+        Borra todo menos los 'keep_days' días guardados más recientes (0 = no borra nada) y compacta
+        el archivo (VACUUM) si borró algo. Devuelve los días borrados.
+        """
+        days = self.days()
+        if keep_days <= 0 or len(days) <= keep_days:
+            return []
+        old = days[:-keep_days]
+        with closing(self._connect()) as con, con:
+            has_transitions = con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transitions'").fetchone()
+            for day in old:
+                self._delete_day(con, day)
+                if has_transitions:  # conteos entre días cacheados por history.py
+                    con.execute("DELETE FROM transitions WHERE day = ? OR dia_anterior = ?", (day, day))
+        with closing(self._connect()) as con:
+            con.execute("VACUUM")
+        return old
+
+    @staticmethod
+    def _delete_day(con: sqlite3.Connection, day: str) -> None:
+        for table in TABLES:
+            con.execute(f"DELETE FROM {table} WHERE day = ?", (day,))
+        con.execute("DELETE FROM snapshots WHERE day = ?", (day,))
+
+    # ---- Lectura ----
+    def days(self) -> List[str]:
+        with closing(self._connect()) as con:
+            return [r[0] for r in con.execute("SELECT day FROM snapshots ORDER BY day")]
+
+    def saved_at(self, day: str) -> str:
+        """Marca de guardado del día ('' si no existe); sirve como huella para cachés."""
+        with closing(self._connect()) as con:
+            row = con.execute("SELECT saved_at FROM snapshots WHERE day = ?", (day,)).fetchone()
+        return row[0] if row else ""
+
+    def previous_day(self, day: str) -> Optional[str]:
+        """Último día guardado ANTERIOR a 'day' (YYYY-MM-DD), o None."""
+        with closing(self._connect()) as con:
+            row = con.execute("SELECT MAX(day) FROM snapshots WHERE day < ?", (day,)).fetchone()
+        return row[0] if row else None
+
+    def load_table(self, day: str, table: str) -> pd.DataFrame:
+        cols, _ = TABLES[table]
+        sql = f"SELECT {', '.join(_q(c) for c in cols)} FROM {table} WHERE day = ? ORDER BY orden"
+        with closing(self._connect()) as con:
+            return pd.read_sql_query(sql, con, params=(day,))
+
+    def load_day(self, day: str) -> Dict[str, pd.DataFrame]:
+        return {table: self.load_table(day, table) for table in TABLES}
+
+    def load_yesterday(self, day: str) -> Tuple[pd.DataFrame, YesterdayIndex]:
+        """(Resumen crudo del día, YesterdayIndex de su Conteo): reemplazan al Resumen y al Excel de AYER."""
+        return self.load_table(day, "raw"), YesterdayIndex.from_conteo(self.load_table(day, "conteo"))
+
+    def find(self, table: str, clave: Optional[str] = None, placa: Optional[str] = None) -> pd.DataFrame:
+        """Filas de 'table' (todos los días) por clave canónica y/o placa, usando los índices."""
+        cols, keyed = TABLES[table]
+        where, params = [], []
+        if clave is not None and keyed:
+            where.append("clave = ?")
+            params.append(clave)
+        if placa is not None and "placa" in cols:
+            where.append("placa = ?")
+            params.append(placa)
+        sql = f"SELECT day, {', '.join(_q(c) for c in cols)} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY day, orden"
+        with closing(self._connect()) as con:
+            return pd.read_sql_query(sql, con, params=params)
@@ -0,0 +1,101 @@
+import random
+
+import pandas as pd
+
+import aggregator
+from aggregator import IncrementalAggregate, PlatformBits, aggregate_masks, render_platforms
+
+PLATFORMS = ["SIMIT", "FENIX", "Bello", "Cali"]
+
+
+def _rows(n, seed, n_keys=400, platform=None):
+    """Filas tipo parsers con números repetidos (con y sin letra), fechas y placas vacías a ratos."""
+    rnd = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        k = rnd.randrange(n_keys)
+        num = rnd.choice([f"{k:019d}", f"A{k:012d}", f"{k:05d}-{k:014d}", ""])
+        rows.append({
+            "numero_comparendo": num,
+            "fecha_imposicion": rnd.choice(["", "2024-05-01", "2024-05-02"]),
+            "fecha_notificacion": rnd.choice(["", "", "2024-05-03"]),
+            "placa": rnd.choice(["", "ABC123", "XYZ12A"]),
+            "plataforma": platform if platform is not None else rnd.choice(PLATFORMS + ["Otra", ""]),
+        })
+    return rows
+
+
+def _full(sources, inc):
+    """aggregate_masks sobre las fuentes concatenadas en el orden del incremental, con texto de plataformas."""
+    rows = [r for s in inc.sources() for r in sources[s]]
+    bits = PlatformBits(PLATFORMS)
+    return render_platforms(aggregate_masks(pd.DataFrame(rows), bits), bits).reset_index(drop=True)
+
+
+def _check(sources, inc):
+    got = render_platforms(inc.to_frame(), inc.bits).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, _full(sources, inc), check_dtype=False)
+
+
+def test_incremental_matches_full_aggregate(monkeypatch):
+    rebuilds = []
+    real_rebuild = IncrementalAggregate._rebuild
+    monkeypatch.setattr(IncrementalAggregate, "_rebuild",
+                        lambda self, fresh_bits=False: rebuilds.append(fresh_bits) or real_rebuild(self, fresh_bits))
+
+    inc = IncrementalAggregate(PLATFORMS)
+    sources = {p: _rows(600, seed=i, platform=p) for i, p in enumerate(PLATFORMS)}
+    sources["Cali"] = _rows(600, seed=9)  # plataformas mezcladas y desconocidas
+    inc.replace_sources(sources)
+    _check(sources, inc)
+
+    steps = [
+        {"Bello": _rows(20, seed=11, platform="Bello")},        # cambio chico: parche en su lugar
+        {"FENIX": []},                                           # una plataforma desaparece
+        {"Nueva": _rows(15, seed=12, platform="Nueva")},        # fuente fuera de platform_order
+        {"SIMIT": _rows(30, seed=13)},
+        {p: _rows(600, seed=20 + i) for i, p in enumerate(PLATFORMS)},  # casi todo cambia: REBUILD_RATIO
+    ]
+    for step in steps:
+        before = len(rebuilds)
+        inc.replace_sources(step)
+        for source, rows in step.items():
+            if rows:
+                sources[source] = rows
+            else:
+                sources.pop(source, None)
+        _check(sources, inc)
+        if step is steps[0]:
+            assert len(rebuilds) == before  # no recalculó todo
+        if step is steps[1]:
+            assert "FENIX" not in inc.sources()
+    assert rebuilds[-1] is False  # el último paso cayó en el recálculo por REBUILD_RATIO
+    assert inc.last_changed is not None
+
+
+def test_vectorized_matches_rowwise():
+    rows = _rows(800, seed=3, n_keys=150)
+    rows += [
+        # mismo número en varias plataformas; la primera placa/fecha no vacía gana, la versión con letra se muestra
+        {"numero_comparendo": "0000000000000000777", "fecha_imposicion": "", "fecha_notificacion": "",
+         "placa": "", "plataforma": "Cali"},
+        {"numero_comparendo": "A0000000000000000777", "fecha_imposicion": "2024-01-02", "fecha_notificacion": "",
+         "placa": "FIRST1", "plataforma": "SIMIT"},
+        {"numero_comparendo": "0000000000000000777", "fecha_imposicion": "2024-09-09", "fecha_notificacion": "2024-01-05",
+         "placa": "LATER2", "plataforma": "Cali"},
+        # sin fechas ni placa en ninguna fila
+        {"numero_comparendo": "0000000000000000888", "fecha_imposicion": "", "fecha_notificacion": "",
+         "placa": "", "plataforma": "FENIX"},
+        {"numero_comparendo": "0000000000000000888", "fecha_imposicion": " ", "fecha_notificacion": "",
+         "placa": "", "plataforma": "Bello"},
+    ]
+    df = pd.DataFrame(rows)
+    vec = aggregator.aggregate_by_comparendo(df, PLATFORMS, engine="vectorized")
+    ref = aggregator.aggregate_by_comparendo(df, PLATFORMS, engine="rowwise")
+    pd.testing.assert_frame_equal(vec.reset_index(drop=True), ref.reset_index(drop=True), check_dtype=False)
+
+    first = vec.set_index("numero_comparendo")
+    assert first.loc["A0000000000000000777", ["fecha_imposicion", "fecha_notificacion", "placa"]].tolist() == \
+        ["2024-01-02", "2024-01-05", "FIRST1"]
+    assert first.loc["A0000000000000000777", "plataformas"] == "SIMIT-Cali"
+    assert first.loc["0000000000000000888", ["fecha_imposicion", "placa", "numero_veces"]].tolist() == ["", "", 2]
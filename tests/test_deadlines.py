@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from business_days import discount_windows, get_calendar
+from deadlines import DeadlineQueue
+
+COLS = ["numero_comparendo", "placa", "plataformas", "fecha_notificacion"]
+NOTIFS = ["", "2024-04-01", "2024-04-15", "2024-04-16", "2024-05-02", "No aplica"]
+
+
+def _conteo(seed, n_keys=300):
+    rnd = random.Random(seed)
+    keys = rnd.sample(range(1000), n_keys)
+    rows = [(f"{k:019d}", rnd.choice(["ABC123", ""]), rnd.choice(["SIMIT", "SIMIT-FENIX"]), rnd.choice(NOTIFS))
+            for k in sorted(keys)]
+    return pd.DataFrame(rows, columns=COLS)
+
+
+def _state(queue):
+    return len(queue), queue.due_within(400, today="2024-01-01")
+
+
+def test_apply_changes_matches_apply_conteo():
+    queue = DeadlineQueue()
+    prev = _conteo(0)
+    queue.apply_conteo(prev)
+    for seed in range(1, 6):
+        new = _conteo(seed, n_keys=250 + 20 * seed)
+        merged = prev.merge(new, on="numero_comparendo", how="outer", suffixes=("_a", "_b"), indicator=True)
+        same = merged["_merge"] == "both"
+        for c in COLS[1:]:
+            same &= merged[f"{c}_a"] == merged[f"{c}_b"]
+        changed = merged.loc[~same, "numero_comparendo"].tolist()  # entran, salen o cambian
+        queue.apply_changes(new[new["numero_comparendo"].isin(changed)], changed)
+
+        fresh = DeadlineQueue()
+        fresh.apply_conteo(new)
+        n, due = _state(queue)
+        n_fresh, due_fresh = _state(fresh)
+        assert n == n_fresh
+        pd.testing.assert_frame_equal(due, due_fresh)
+        prev = new
+
+
+def test_due_within_window_boundaries():
+    limite_50, _, hasta_25 = discount_windows(["2024-04-15"])[0]
+    queue = DeadlineQueue()
+    queue.apply_conteo(pd.DataFrame([("0000000000000000001", "ABC123", "SIMIT", "2024-04-15")], columns=COLS))
+    cal = get_calendar()
+
+    # El día del vencimiento se incluye (0 días hábiles); el día siguiente ya no
+    due = queue.due_within(0, today=limite_50, kinds=("50%",))
+    assert due["vence"].tolist() == [limite_50] and due["dias_habiles"].tolist() == [0]
+    next_day = str(cal.add(np.array([np.datetime64(limite_50, "D")]), 1)[0])
+    assert queue.due_within(10, today=next_day, kinds=("50%",)).empty
+
+    # Justo n días hábiles antes: entra con n, no con n - 1
+    today = "2024-04-16"
+    n = int(np.busday_count(np.datetime64(today), np.datetime64(hasta_25), busdaycal=cal.busdaycal))
+    due = queue.due_within(n, today=today, kinds=("25%",))
+    assert due["vence"].tolist() == [hasta_25] and due["dias_habiles"].tolist() == [n]
+    assert queue.due_within(n - 1, today=today, kinds=("25%",)).empty
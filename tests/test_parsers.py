@@ -0,0 +1,52 @@
+import pytest
+
+from parsers import parse_simit, parse_simit_coactivos, parse_simit_full
+
+COMPARENDO = """\
+Comparendo
+08001000000012345678
+Secretaría de Tránsito de Barranquilla
+Fecha imposición: 01/03/2024\t05/03/2024\tABC123
+Pendiente de pago\t$ 604.100
+"""
+
+COACTIVO = """\
+202531224
+Multa
+Cobro coactivo
+Fecha resolución: 15/02/2024\tXYZ12A\tSecretaría de Tránsito de Soledad
+C29
+Pendiente de pago\t$ 603.939
+Intereses\t$ 12.000
+$ 615.939"""
+
+FIXTURES = {
+    "normal": COMPARENDO + "\n" + COACTIVO + "\n\n" + COMPARENDO.replace("12345678", "87654321"),
+    # el bloque coactivo va pegado al comparendo siguiente (sin línea en blanco)
+    "sin_linea_en_blanco": COACTIVO + "\n" + COMPARENDO,
+    # el texto termina dentro de la ventana del bloque, sin salto de línea final
+    "al_final": COMPARENDO + COACTIVO,
+    # bloque cortado: número + 'Multa' y nada más; número sin 'Fecha imposición:' al final
+    "truncado": COMPARENDO + "202599999\nMulta\n08001000000099999999",
+    # candidato sin 'Multa' en sus 3 líneas siguientes y candidatos seguidos
+    "candidatos": "1234567\nuno\ndos\ntres\nMulta\n7654321\n7654322\nMulta\n" + COMPARENDO,
+    "vacio": "",
+}
+
+
+@pytest.mark.parametrize("name", sorted(FIXTURES))
+def test_parse_simit_full_matches_two_passes(name):
+    text = FIXTURES[name]
+    records, coactivos = parse_simit_full(text)
+    assert records == parse_simit(text)
+    assert coactivos == parse_simit_coactivos(text)
+
+
+def test_parse_simit_full_fields():
+    records, coactivos = parse_simit_full(FIXTURES["al_final"])
+    assert [r["numero_comparendo"] for r in records] == ["08001000000012345678"]
+    assert records[0]["placa"] == "ABC123"
+    assert len(coactivos) == 1
+    co = coactivos[0]
+    assert (co["numero_coactivo"], co["placa"], co["codigo_infraccion"], co["interes"]) == \
+        ("202531224", "XYZ12A", "C29", "$ 12.000")
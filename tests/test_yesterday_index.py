@@ -0,0 +1,42 @@
+import datetime as dt
+
+import openpyxl
+import pandas as pd
+
+from yesterday_index import SNIFF_ROWS, YesterdayIndex
+
+HEADER = ["#", "Placa", "Comparendo", "Organismo", "Estado", "Valor", "Infracción",
+          "Fecha imposición", "Fecha notificación", "Medio", "Observación", "Gestor"]
+LATE_ROW = 61  # fila Excel (1-based), fuera de las SNIFF_ROWS primeras
+
+
+def _workbook(path):
+    """Encabezado en la fila 7; en 'Observación' aparece un comparendo solo a partir de LATE_ROW."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for c, text in enumerate(HEADER, start=1):
+        ws.cell(row=7, column=c, value=text)
+    for r in range(8, 81):
+        ws.cell(row=r, column=1, value=r - 7)
+        ws.cell(row=r, column=2, value=f"ABC{r:03d}")
+        ws.cell(row=r, column=3, value=f"{r:019d}")
+        ws.cell(row=r, column=8, value=dt.datetime(2024, 5, 1))
+        ws.cell(row=r, column=9, value="No aplica")
+        ws.cell(row=r, column=11, value=f"ver {900000000000 + r}" if r >= LATE_ROW else "sin novedad")
+    wb.save(path)
+    return path
+
+
+def test_detect_keeps_numbers_outside_sampled_columns(tmp_path):
+    path = _workbook(tmp_path / "ayer.xlsx")
+    assert LATE_ROW > SNIFF_ROWS
+    late_key = str(900000000000 + LATE_ROW)
+
+    baseline = YesterdayIndex.from_workbook(path)
+    detected = YesterdayIndex.from_workbook(path, detect=True)
+    built = YesterdayIndex.build(pd.read_excel(path, header=None), detect=True)
+
+    assert late_key in baseline
+    assert detected.keys() == baseline.keys()
+    assert built.keys() == baseline.keys()
+    assert detected.get(late_key)["fila"] == LATE_ROW - 1
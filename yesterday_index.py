@@ -0,0 +1,556 @@
+# yesterday_index.py
+from __future__ import annotations
+import re
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from openpyxl import load_workbook
+
+from aggregator import canonical_num  # solo dígitos
+from date_utils import to_iso_loose_or_keep as _to_str_date_like
+
+# -------------------- Regex auxiliares --------------------
+_PLATE_INLINE_RE = re.compile(
+    r"([A-Za-z]{3}\d{3}|[A-Za-z]{3}\d{2}[A-Za-z]|[A-Za-z]{2}\d{3}[A-Za-z])"
+)
+_DATE_INLINE_RE = re.compile(r"\b(\d{1,2}/\d{1,2}/\d{2,4})\b")
+_ALNUM_TOKEN_RE = re.compile(r"[A-Za-z0-9]{11,}")
+_PLATE_CELL_RE = re.compile(r"[A-Z]{3}\d{3}|[A-Z]{3}\d{2}[A-Z]|[A-Z]{2}\d{3}[A-Z]")
+_DATE_CELL_RE = re.compile(r"\d{1,2}/\d{1,2}/\d{2,4}|\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?")
+
+# -------------------- Utils --------------------
+def _find_plate_in_row(row_vals: List[str]) -> str:
+    for raw in row_vals:
+        if not raw or str(raw).lower() in ("nan", "none"):
+            continue
+        s = re.sub(r"[\s\-]", "", str(raw).upper())
+        m = _PLATE_INLINE_RE.search(s)
+        if m:
+            return m.group(1).upper()
+    return ""
+
+def _find_dates_in_row(row_vals: List[str]) -> List[str]:
+    out: List[str] = []
+    for raw in row_vals:
+        if not raw:
+            continue
+        for m in _DATE_INLINE_RE.findall(str(raw)):
+            out.append(_to_str_date_like(m))
+    return out
+
+def _iter_comparendos_in_cell(cell_text: str):
+    """
+    - Normaliza removiendo espacios, guiones, puntos, slashes, underscores, etc.
+    - Busca tokens alfanuméricos y filtra los que tengan >=11 dígitos.
+    """
+    if not cell_text:
+        return
+    s = str(cell_text)
+    s = re.sub(r"[\s\.\-_/]", "", s)  # <--- normalización importante
+    for m in _ALNUM_TOKEN_RE.finditer(s):
+        tok = m.group(0)
+        if sum(ch.isdigit() for ch in tok) >= 11:
+            yield tok
+
+# -------------------- Escaneo vectorizado --------------------
+def _cells_as_str(df: pd.DataFrame) -> pd.DataFrame:
+    """Cada celda como str(valor), igual que .iloc[i, :].astype(str) fila por fila (NaN -> 'nan', Timestamp completo)."""
+    return df.astype(object).astype(str)
+
+def scan_comparendo_cells(cells: pd.DataFrame) -> pd.DataFrame:
+    """
+    Todos los tokens de comparendo de un DataFrame de celdas ya convertidas a str (ver _cells_as_str),
+    en orden fila -> columna -> posición, con su procedencia:
+      pos (fila 0-based dentro de 'cells'), col (posición de columna), token.
+    Mismos tokens que _iter_comparendos_in_cell celda por celda: se quitan separadores, se buscan
+    [A-Za-z0-9]{11,} y se conservan los que tienen >= 11 dígitos.
+    """
+    empty = pd.DataFrame({"pos": pd.Series(dtype="int64"), "col": pd.Series(dtype="int64"),
+                          "token": pd.Series(dtype=object)})
+    if cells.empty:
+        return empty
+    stacked = pd.Series(
+        cells.to_numpy().ravel(),
+        index=pd.MultiIndex.from_product([range(cells.shape[0]), range(cells.shape[1])], names=["pos", "col"]),
+    )
+    # Una celda con menos de 11 dígitos no puede tener un token válido: se descarta antes de extraer
+    stacked = stacked[stacked.str.len() >= 11]
+    stacked = stacked[stacked.str.count(r"\d") >= 11]
+    if stacked.empty:
+        return empty
+    norm = stacked.str.replace(r"[\s\.\-_/]", "", regex=True)
+    found = norm.str.extractall(r"([A-Za-z0-9]{11,})")[0]
+    found = found[found.str.count(r"\d") >= 11]
+    if found.empty:
+        return empty
+    return pd.DataFrame({
+        "pos": found.index.get_level_values("pos").astype("int64"),
+        "col": found.index.get_level_values("col").astype("int64"),
+        "token": found.to_numpy(dtype=object),
+    })
+
+# -------------------- Detección de encabezado y columnas --------------------
+SNIFF_ROWS = 30          # filas del inicio que se miran para detectar el formato
+SNIFF_MIN_SHARE = 0.6    # fracción de celdas con el patrón para asignar un rol por valores
+# rol -> palabra que debe aparecer en el encabezado (sin tildes, minúsculas)
+HEADER_ROLES = {
+    "plate_col_idx": "placa",
+    "date_imp_col_idx": "imposicion",
+    "date_notif_col_idx": "notificacion",
+    "comparendo_cols": "comparendo",
+}
+
+def _fold(value: Any) -> str:
+    text = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.lower().split())
+
+def _is_blank(value: Any) -> bool:
+    if value is None or value is pd.NaT or (isinstance(value, float) and value != value):
+        return True
+    return isinstance(value, str) and not value.strip()
+
+def _header_roles(row: Sequence[Any]) -> Dict[str, Any]:
+    """Roles reconocidos por el texto de una fila candidata a encabezado (el primero gana; comparendo admite varias)."""
+    found: Dict[str, Any] = {}
+    for c, value in enumerate(row):
+        if _is_blank(value) or not isinstance(value, str):
+            continue
+        text = _fold(value)
+        for role, word in HEADER_ROLES.items():
+            if word not in text:
+                continue
+            if role == "comparendo_cols":
+                found.setdefault(role, []).append(c)
+            elif role not in found:
+                found[role] = c
+            break
+    return found
+
+def _column_share(sample: List[Sequence[Any]], col: int, test) -> float:
+    values = [r[col] for r in sample if col < len(r) and not _is_blank(r[col])]
+    return sum(1 for v in values if test(v)) / len(values) if values else 0.0
+
+def _has_comparendo(value: Any) -> bool:
+    return not isinstance(value, datetime) and any(True for _ in _iter_comparendos_in_cell(_cell_text(value)))
+
+def _is_plate(value: Any) -> bool:
+    return isinstance(value, str) and bool(_PLATE_CELL_RE.fullmatch(re.sub(r"[\s\-]", "", value.upper())))
+
+def _is_date(value: Any) -> bool:
+    return isinstance(value, datetime) or (isinstance(value, str) and bool(_DATE_CELL_RE.fullmatch(value.strip())))
+
+def sniff_layout(head_rows: Sequence[Sequence[Any]]) -> Dict[str, Any]:
+    """
+    Formato del Excel de AYER a partir de sus primeras filas (valores crudos, p. ej. las SNIFF_ROWS
+    primeras). Devuelve los argumentos de YesterdayIndex.build/from_workbook que pudo reconocer:
+      header_row_excel_1based, plate_col_idx, date_imp_col_idx, date_notif_col_idx, comparendo_cols
+    y 'complete' = True si los encontró todos (entonces el escaneo no necesita buscar fechas/placa en línea).
+    'comparendo_cols' solo dice dónde hubo números en la muestra: confirma el formato, no limita el escaneo.
+    El encabezado es la fila con más roles reconocidos por texto (al menos dos); los roles que falten se
+    completan por los valores de las filas siguientes (placas, fechas, números de comparendo). Sin
+    encabezado reconocible, los datos empiezan en la primera fila con un número de comparendo.
+    """
+    rows = [tuple(r) for r in head_rows[:SNIFF_ROWS]]
+    best, best_roles = -1, {}
+    for i, row in enumerate(rows):
+        roles = _header_roles(row)
+        if len(roles) >= 2 and len(roles) > len(best_roles):
+            best, best_roles = i, roles
+    if best < 0:
+        best = next((i - 1 for i, r in enumerate(rows) if any(_has_comparendo(v) for v in r)), -2)
+        if best == -2:
+            return {"complete": False}
+    layout: Dict[str, Any] = {"header_row_excel_1based": best + 1, **best_roles}
+
+    sample = rows[best + 1:]
+    n_cols = max((len(r) for r in sample), default=0)
+    # Cualquier columna con números de comparendo en la muestra se escanea (además de la del encabezado)
+    by_value = [c for c in range(n_cols) if _column_share(sample, c, _has_comparendo) > 0]
+    comp_cols = sorted(set(layout.get("comparendo_cols", [])) | set(by_value))
+    if comp_cols:
+        layout["comparendo_cols"] = comp_cols
+    taken = set(comp_cols) | {layout[k] for k in ("plate_col_idx", "date_imp_col_idx", "date_notif_col_idx") if k in layout}
+    if "plate_col_idx" not in layout:
+        plates = [c for c in range(n_cols) if c not in taken and _column_share(sample, c, _is_plate) >= SNIFF_MIN_SHARE]
+        if plates:
+            layout["plate_col_idx"] = plates[0]
+            taken.add(plates[0])
+    shares = {c: _column_share(sample, c, _is_date) for c in range(n_cols) if c not in taken}
+    dates = [c for c, share in shares.items() if share >= SNIFF_MIN_SHARE]
+    if "date_imp_col_idx" not in layout and "date_notif_col_idx" not in layout and len(dates) >= 2:
+        # Sin encabezados de fecha: la imposición siempre tiene fecha; la notificación puede decir 'No aplica'
+        dates[:2] = sorted(dates[:2], key=lambda c: -shares[c])
+    for role in ("date_imp_col_idx", "date_notif_col_idx"):
+        if role not in layout and dates:
+            layout[role] = dates.pop(0)
+
+    layout["complete"] = all(k in layout for k in HEADER_ROLES)
+    return layout
+
+# -------------------- Lectura directa del Excel --------------------
+def _cell_text(value: Any) -> str:
+    """
+    Texto de una celda de openpyxl tal como lo vería read_excel: None -> '', float entero -> int,
+    datetime -> 'YYYY-MM-DD HH:MM:SS' (mismo str que pd.Timestamp).
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+@contextmanager
+def open_first_sheet(source: Union[str, IO[bytes]]):
+    """Hoja 0 en modo solo lectura (streaming): openpyxl no arma la hoja en memoria."""
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield wb.worksheets[0]
+    finally:
+        wb.close()
+
+def iter_sheet_rows(
+    ws: Any,
+    first_row_excel_1based: int = 1,
+    max_col: Optional[int] = None,
+    max_row: Optional[int] = None,
+) -> Iterator[Tuple[int, Tuple[Any, ...]]]:
+    """(fila 0-based, valores crudos) sin construir ningún DataFrame. 'max_col' / 'max_row' (1-based) recortan."""
+    rows = ws.iter_rows(min_row=first_row_excel_1based, max_row=max_row, max_col=max_col, values_only=True)
+    return enumerate(rows, start=first_row_excel_1based - 1)
+
+def _layout_args(layout: Dict[str, Any], **defaults: Any) -> Dict[str, Any]:
+    """
+    Argumentos de escaneo a partir de sniff_layout: lo detectado (encabezado, fechas, placa) reemplaza a
+    los valores por defecto y, con el formato completo, se omite la búsqueda de fechas/placa en línea.
+    Los números de comparendo se siguen buscando en todas las celdas: una columna que no tenía números
+    en la muestra puede tenerlos más abajo (p. ej. 'Observación').
+    """
+    args = {**defaults, **{k: v for k, v in layout.items() if k in defaults}}
+    args["inline_fallback"] = not layout.get("complete")
+    return args
+
+# -------------------- Índice AYER --------------------
+class YesterdayIndex:
+    """
+    Índice del Excel de AYER (hoja 0, header=None), construido UNA sola vez por archivo.
+    Mapea clave canónica -> datos de la primera fila donde aparece el comparendo:
+      - numero_comparendo: número tal como aparece en el Excel
+      - imp_ayer / notif_ayer: fechas normalizadas (con respaldo de fechas en línea)
+      - placa_ayer: placa de la columna de placa (o detectada en la fila)
+      - notif_raw: valor crudo de la celda de notificación (lo usa 'Modificados')
+      - fila: índice 0-based de la fila en el DataFrame
+    Lo consumen build_three_tables y build_modificados_table; las consultas son O(1).
+    """
+
+    FRAME_COLS = ["clave", "numero_comparendo", "imp_ayer", "notif_ayer", "placa_ayer", "notif_raw", "fila"]
+
+    def __init__(self, entries: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.entries: Dict[str, Dict[str, Any]] = entries or {}
+        self._frame: Optional[pd.DataFrame] = None
+
+    @classmethod
+    def build(
+        cls,
+        df_yesterday_any: pd.DataFrame,
+        date_imp_col_idx: int = 7,
+        date_notif_col_idx: int = 8,
+        plate_col_idx: int = 1,
+        header_row_excel_1based: int = 7,
+        engine: str = "vectorized",
+        detect: bool = False,
+    ) -> "YesterdayIndex":
+        """
+        engine="vectorized": todas las celdas se escanean de una vez (scan_comparendo_cells) y solo
+        las filas con comparendos se recorren para fechas/placa. engine="rowwise": el recorrido
+        fila por fila original (referencia). Ambos producen las mismas entradas.
+        detect=True: encabezado, fechas y placa salen de sniff_layout (ver from_workbook); con el formato
+        completo no hay búsqueda de fechas/placa en línea. Los comparendos se buscan igual en todas las celdas.
+        """
+        inline_fallback = True
+        if detect and isinstance(df_yesterday_any, pd.DataFrame):
+            args = _layout_args(
+                sniff_layout(df_yesterday_any.head(SNIFF_ROWS).to_numpy().tolist()),
+                date_imp_col_idx=date_imp_col_idx, date_notif_col_idx=date_notif_col_idx,
+                plate_col_idx=plate_col_idx, header_row_excel_1based=header_row_excel_1based,
+            )
+            date_imp_col_idx, date_notif_col_idx = args["date_imp_col_idx"], args["date_notif_col_idx"]
+            plate_col_idx, header_row_excel_1based = args["plate_col_idx"], args["header_row_excel_1based"]
+            inline_fallback = args["inline_fallback"]
+        if engine == "rowwise":
+            return cls._build_rowwise(df_yesterday_any, date_imp_col_idx, date_notif_col_idx,
+                                      plate_col_idx, header_row_excel_1based)
+        entries: Dict[str, Dict[str, Any]] = {}
+        n_rows, n_cols = df_yesterday_any.shape if isinstance(df_yesterday_any, pd.DataFrame) else (0, 0)
+        data_start_idx = min(header_row_excel_1based, n_rows)
+        if n_rows <= data_start_idx or n_cols == 0:
+            return cls(entries)
+
+        data = df_yesterday_any.iloc[data_start_idx:]
+        cells = _cells_as_str(data)
+        hits = scan_comparendo_cells(cells)
+        if hits.empty:
+            return cls(entries)
+
+        values = cells.to_numpy()
+        # Columnas crudas como .array: cada elemento sale con el mismo tipo que daría .iat (Timestamp, np.float64, ...)
+        raw = {c: data.iloc[:, c].array for c in (date_imp_col_idx, date_notif_col_idx, plate_col_idx) if c < n_cols}
+        tokens_by_row: Dict[int, List[str]] = {}
+        for pos, tok in zip(hits["pos"].tolist(), hits["token"].tolist()):
+            tokens_by_row.setdefault(pos, []).append(tok)
+
+        for pos, comps_in_row in tokens_by_row.items():
+            row_vals = [v.strip() for v in values[pos]] if inline_fallback else []
+            notif_raw = raw[date_notif_col_idx][pos] if date_notif_col_idx < n_cols else None
+            imp_ayer = _to_str_date_like(raw[date_imp_col_idx][pos]) if date_imp_col_idx < n_cols else ""
+            notif_ayer = _to_str_date_like(notif_raw) if date_notif_col_idx < n_cols else ""
+
+            if inline_fallback and (not imp_ayer or not notif_ayer):
+                dates_inline = _find_dates_in_row(row_vals)
+                if not imp_ayer and len(dates_inline) >= 1:
+                    imp_ayer = dates_inline[0]
+                if not notif_ayer and len(dates_inline) >= 2:
+                    notif_ayer = dates_inline[1]
+
+            placa_ayer = ""
+            if plate_col_idx < n_cols and not pd.isna(raw[plate_col_idx][pos]):
+                placa_ayer = re.sub(r"[\s\-]", "", values[pos, plate_col_idx].upper()).strip()
+            if not placa_ayer and inline_fallback:
+                placa_ayer = _find_plate_in_row(row_vals)
+
+            for val in comps_in_row:
+                key = canonical_num(val)  # solo dígitos
+                if not key or key in entries:
+                    continue
+                entries[key] = {
+                    "numero_comparendo": val,
+                    "imp_ayer": imp_ayer,
+                    "notif_ayer": notif_ayer,
+                    "placa_ayer": placa_ayer,
+                    "notif_raw": notif_raw,
+                    "fila": data_start_idx + pos,
+                }
+
+        return cls(entries)
+
+    @classmethod
+    def from_workbook(
+        cls,
+        source: Union[str, IO[bytes]],
+        date_imp_col_idx: int = 7,
+        date_notif_col_idx: int = 8,
+        plate_col_idx: int = 1,
+        header_row_excel_1based: int = 7,
+        comparendo_cols: Optional[Sequence[int]] = None,
+        detect: bool = False,
+    ) -> "YesterdayIndex":
+        """
+        Igual que build(pd.read_excel(source, header=None)), pero leyendo el .xlsx en streaming:
+        solo las filas de datos, sin DataFrame intermedio y convirtiendo a texto únicamente las
+        celdas que pueden tener un comparendo (>= 11 caracteres) o que se usan (fechas, placa).
+        'comparendo_cols' (índices 0-based) limita dónde se buscan números; entonces se leen solo
+        las columnas hasta la mayor de ellas, fechas y placa.
+        detect=True: encabezado, fechas y placa salen de sniff_layout sobre las primeras SNIFF_ROWS filas
+        (los argumentos dados quedan como respaldo de lo que no se reconozca); los comparendos se
+        siguen buscando en todas las columnas salvo que se pase 'comparendo_cols'.
+        Diferencia deliberada: un número guardado como celda numérica en una columna con vacíos se
+        lee como '123...' y no como '123....0' (read_excel lo pasa a float).
+        """
+        args = {"date_imp_col_idx": date_imp_col_idx, "date_notif_col_idx": date_notif_col_idx,
+                "plate_col_idx": plate_col_idx, "header_row_excel_1based": header_row_excel_1based}
+        with open_first_sheet(source) as ws:
+            if detect:
+                head = [row for _, row in iter_sheet_rows(ws, max_row=SNIFF_ROWS)]
+                args = _layout_args(sniff_layout(head), **args)
+            else:
+                args["inline_fallback"] = True
+            fixed = [args["date_imp_col_idx"], args["date_notif_col_idx"], args["plate_col_idx"]]
+            scan_cols = None if comparendo_cols is None else sorted(set(comparendo_cols))
+            max_col = None if scan_cols is None else max(fixed + scan_cols) + 1
+            rows = iter_sheet_rows(ws, args["header_row_excel_1based"] + 1, max_col=max_col)
+            return cls._from_rows(rows, args["date_imp_col_idx"], args["date_notif_col_idx"],
+                                  args["plate_col_idx"], scan_cols, args["inline_fallback"])
+
+    @classmethod
+    def _from_rows(
+        cls,
+        rows: Iterable[Tuple[int, Tuple[Any, ...]]],
+        date_imp_col_idx: int,
+        date_notif_col_idx: int,
+        plate_col_idx: int,
+        scan_cols: Optional[List[int]] = None,
+        inline_fallback: bool = True,
+    ) -> "YesterdayIndex":
+        """
+        Mismas reglas que build() fila por fila, sobre valores crudos de openpyxl.
+        inline_fallback=False: fechas y placa salen solo de sus columnas (sin regex sobre toda la fila).
+        No usa scan_comparendo_cells: openpyxl entrega objetos de Python que hay que pasar a texto celda
+        por celda de todos modos, y este ciclo ya descarta las celdas de menos de 11 caracteres antes de
+        cualquier regex; juntar bloques en un DataFrame para escanearlos resultó más lento. El costo de
+        from_workbook lo pone el parseo del XML de openpyxl, no este ciclo.
+        """
+        entries: Dict[str, Dict[str, Any]] = {}
+        for i, row in rows:
+            n_cols = len(row)
+            cells = row if scan_cols is None else [row[c] for c in scan_cols if c < n_cols]
+            comps_in_row: List[str] = []
+            for v in cells:
+                if v is None or isinstance(v, datetime):
+                    continue
+                text = _cell_text(v)
+                if len(text) >= 11:
+                    comps_in_row.extend(_iter_comparendos_in_cell(text))
+            if not comps_in_row:
+                continue
+
+            notif_raw = row[date_notif_col_idx] if date_notif_col_idx < n_cols else None
+            imp_ayer = _to_str_date_like(row[date_imp_col_idx]) if date_imp_col_idx < n_cols else ""
+            notif_ayer = _to_str_date_like(notif_raw) if date_notif_col_idx < n_cols else ""
+
+            row_vals: Optional[List[str]] = None
+            if inline_fallback and (not imp_ayer or not notif_ayer):
+                row_vals = [_cell_text(v).strip() for v in row]
+                dates_inline = _find_dates_in_row(row_vals)
+                if not imp_ayer and len(dates_inline) >= 1:
+                    imp_ayer = dates_inline[0]
+                if not notif_ayer and len(dates_inline) >= 2:
+                    notif_ayer = dates_inline[1]
+
+            placa_ayer = ""
+            if plate_col_idx < n_cols and row[plate_col_idx] is not None:
+                placa_ayer = re.sub(r"[\s\-]", "", _cell_text(row[plate_col_idx]).upper()).strip()
+            if not placa_ayer and inline_fallback:
+                placa_ayer = _find_plate_in_row(row_vals if row_vals is not None else [_cell_text(v).strip() for v in row])
+
+            for val in comps_in_row:
+                key = canonical_num(val)  # solo dígitos
+                if not key or key in entries:
+                    continue
+                entries[key] = {
+                    "numero_comparendo": val,
+                    "imp_ayer": imp_ayer,
+                    "notif_ayer": notif_ayer,
+                    "placa_ayer": placa_ayer,
+                    "notif_raw": notif_raw,
+                    "fila": i,
+                }
+        return cls(entries)
+
+    @classmethod
+    def _build_rowwise(
+        cls,
+        df_yesterday_any: pd.DataFrame,
+        date_imp_col_idx: int,
+        date_notif_col_idx: int,
+        plate_col_idx: int,
+        header_row_excel_1based: int,
+    ) -> "YesterdayIndex":
+        entries: Dict[str, Dict[str, Any]] = {}
+        n_rows, n_cols = df_yesterday_any.shape if isinstance(df_yesterday_any, pd.DataFrame) else (0, 0)
+        data_start_idx = header_row_excel_1based
+
+        for i in range(min(data_start_idx, n_rows), n_rows):
+            row_vals = df_yesterday_any.iloc[i, :].astype(str).str.strip().tolist()
+
+            comps_in_row: List[str] = []
+            for v in row_vals:
+                if not v or v.lower() in ("nan", "none"):
+                    continue
+                for token in _iter_comparendos_in_cell(v):
+                    comps_in_row.append(token)
+
+            if not comps_in_row:
+                continue
+
+            notif_raw = df_yesterday_any.iat[i, date_notif_col_idx] if date_notif_col_idx < n_cols else None
+            imp_ayer = _to_str_date_like(df_yesterday_any.iat[i, date_imp_col_idx]) if date_imp_col_idx < n_cols else ""
+            notif_ayer = _to_str_date_like(notif_raw) if date_notif_col_idx < n_cols else ""
+
+            if not imp_ayer or not notif_ayer:
+                dates_inline = _find_dates_in_row(row_vals)
+                if not imp_ayer and len(dates_inline) >= 1:
+                    imp_ayer = dates_inline[0]
+                if not notif_ayer and len(dates_inline) >= 2:
+                    notif_ayer = dates_inline[1]
+
+            placa_ayer = ""
+            if plate_col_idx < n_cols:
+                val = df_yesterday_any.iat[i, plate_col_idx]
+                if not pd.isna(val):
+                    placa_ayer = re.sub(r"[\s\-]", "", str(val).upper()).strip()
+            if not placa_ayer:
+                placa_ayer = _find_plate_in_row(row_vals)
+
+            for val in comps_in_row:
+                key = canonical_num(val)  # solo dígitos
+                if not key or key in entries:
+                    continue
+                entries[key] = {
+                    "numero_comparendo": val,
+                    "imp_ayer": imp_ayer,
+                    "notif_ayer": notif_ayer,
+                    "placa_ayer": placa_ayer,
+                    "notif_raw": notif_raw,
+                    "fila": i,
+                }
+
+        return cls(entries)
+
+    @classmethod
+    def from_conteo(cls, df_conteo: pd.DataFrame) -> "YesterdayIndex":
+        """
+        Índice a partir de un Conteo ya procesado (p. ej. el guardado en snapshot_store):
+        las fechas ya vienen normalizadas, así que no hay nada que escanear.
+        """
+        entries: Dict[str, Dict[str, Any]] = {}
+        if df_conteo is None or df_conteo.empty:
+            return cls(entries)
+        cols = ["numero_comparendo", "fecha_imposicion", "fecha_notificacion", "placa"]
+        df = df_conteo.reindex(columns=cols).fillna("").astype(str)
+        for i, (num, imp, notif, placa) in enumerate(df.itertuples(index=False, name=None)):
+            num = num.strip()
+            key = canonical_num(num)
+            if not key or key in entries:
+                continue
+            entries[key] = {
+                "numero_comparendo": num,
+                "imp_ayer": imp.strip(),
+                "notif_ayer": notif.strip(),
+                "placa_ayer": placa.strip(),
+                "notif_raw": notif.strip(),
+                "fila": i,
+            }
+        return cls(entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def get(self, key: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key, default)
+
+    def keys(self) -> set:
+        return set(self.entries)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Una fila por clave (FRAME_COLS), en orden de aparición; se arma una vez y queda en caché."""
+        if self._frame is None:
+            cols = self.FRAME_COLS[1:]
+            data = {c: [e.get(c, "") for e in self.entries.values()] for c in cols}
+            self._frame = pd.DataFrame({"clave": list(self.entries), **data}, columns=self.FRAME_COLS)
+        return self._frame
+
+    def as_legacy_maps(self) -> Tuple[Dict[str, str], set, Dict[str, Dict[str, str]]]:
+        """Formato histórico de extract_comparendos_rowwise_with_dates: (y_original, yesterday_set, y_data)."""
+        y_original = {k: e["numero_comparendo"] for k, e in self.entries.items()}
+        y_data = {
+            k: {"imp_ayer": e["imp_ayer"], "notif_ayer": e["notif_ayer"], "placa_ayer": e["placa_ayer"]}
+            for k, e in self.entries.items()
+        }
+        return y_original, set(self.entries), y_data